@@ -4,15 +4,22 @@ author: "Uyen 'Rachel' Lai and Paul Sheridan"
 ###
 
 import os
-import json
+import sys
+import glob
 import random
+import argparse
 from pathlib import Path
-from collections import Counter
 
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.optimize import curve_fit
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "text-emulation"))
+from heapslaw.corpus import EncodedCorpus, is_corpus_dir, load_corpus
+from heapslaw.jsonstream import iter_documents
+from heapslaw.naming import file_label
+from heapslaw.spectrum import FrequencySpectrum
+
 FILES = [
     ("PubMed_human_Open.json",                "Human"),
     ("PubMed_gptneo-125M_fewshot_Open.json", "GPT-Neo 125M"),
@@ -46,15 +53,16 @@ def h_logistic_u(u, alpha_h, beta_h, gamma_h):
 def load_docs(path):
 
     p = Path(path)
+    if is_corpus_dir(p):
+        # memory-mapped binary corpus: documents are views into the id array
+        return list(load_corpus(p).iter_docs()), p.name
     if not p.exists() and Path(str(p) + ".json").exists():
         p = Path(str(p) + ".json")
     if not p.exists():
         raise FileNotFoundError(p)
-    with p.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{p} is not list[list[str]].")
-    return data, p.name
+    # stream the documents into an id-encoded corpus instead of json.load
+    corpus = EncodedCorpus.from_docs(sub for sub in iter_documents(p) if isinstance(sub, list))
+    return list(corpus.iter_docs()), p.name
 
 
 def cumulative_hapax_rate(docs, cap_per_sublist, seed):
@@ -65,30 +73,22 @@ def cumulative_hapax_rate(docs, cap_per_sublist, seed):
 
     capped = []
     for sub in docs:
-        if not isinstance(sub, list):
+        if not isinstance(sub, (list, np.ndarray)):
             continue
-        if not sub:
+        if not len(sub):
             continue
         capped.append(sub[:cap_per_sublist])
 
-    counts = Counter()
+    # V and the hapax count are updated token by token, no rescan of the counts
+    tracker = FrequencySpectrum()
     N_list, H_list, U_list = [], [], []
-    N = 0
 
     for sub in capped:
-        for w in sub:
-            N += 1
-            counts[w] += 1
-
-        V = len(counts)
-        if V > 0:
-            hapax = sum(1 for c in counts.values() if c == 1)
-            hapax_rate = hapax / V
-        else:
-            hapax_rate = np.nan
+        tracker.update(sub)
+        N = tracker.N
 
         N_list.append(float(N))
-        H_list.append(float(hapax_rate))
+        H_list.append(float(tracker.hapax_rate()))
         U_list.append(float(np.log(max(N, 1))))  # natural log
 
     N_arr = np.array(N_list, dtype=float)
@@ -123,8 +123,7 @@ def fit_hapax_logistic(U, H):
     bounds = ([-50.0, 1e-3, 1e-3], [50.0, 0.999, 10.0])
 
     popt, pcov = curve_fit(
-         h_logistic_u
-    c_u,
+        h_logistic_u,
         u_data,
         h_data,
         p0=p0,
@@ -141,11 +140,26 @@ def fit_hapax_logistic(U, H):
     return alpha_h, beta_h, gamma_h, R2
 
 
+def discover_files(pattern):
+    """All cleaned corpora in the working directory matching `pattern`."""
+    return [(path, file_label(os.path.basename(path))) for path in sorted(glob.glob(pattern))]
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Logistic hapax-rate fits")
+    parser.add_argument('--all', action='store_true',
+                        help='fit every corpus/model/prompt file matching --pattern instead of FILES')
+    parser.add_argument('--pattern', type=str, default='*_Open.json',
+                        help='glob used with --all')
+    args = parser.parse_args()
+
+    files = discover_files(args.pattern) if args.all else FILES
+    title = "all corpora" if args.all else "PubMed Human vs GPT-Neo"
+
     results = []   
     curves  = []
 
-    for path, label in FILES:
+    for path, label in files:
         docs, fname = load_docs(path)
         print(f"Processing {label} from {fname} ...")
 
@@ -221,7 +235,8 @@ def main():
 
     plt.figure(figsize=(10, 6))
 
-    colors = ["tab:blue", "tab:orange", "tab:green", "tab:red"]
+    # C0..C3 are the tab:blue/orange/green/red of the four default files
+    colors = [f"C{i % 10}" for i in range(len(curves))]
 
     for (label, N_all_concat, U_all_concat, H_all_concat,
          alpha_h, beta_h, gamma_h), color in zip(curves, colors):
@@ -243,7 +258,7 @@ def main():
 
     plt.xlabel("log N")
     plt.ylabel("hapax rate  (#hapax / V)")
-    plt.title("Logistic hapax-rate fits (independent, 3-trial mean) — PubMed Human vs GPT-Neo — log N")
+    plt.title(f"Logistic hapax-rate fits (independent, 3-trial mean) — {title} — log N")
     plt.grid(True, linestyle=":", alpha=0.5)
     plt.legend()
     plt.tight_layout()
@@ -274,7 +289,7 @@ def main():
 
     plt.xlabel("N  (tokens)")
     plt.ylabel("hapax rate  (#hapax / V)")
-    plt.title("Logistic hapax-rate fits (independent, 3-trial mean) — PubMed Human vs GPT-Neo — linear N")
+    plt.title(f"Logistic hapax-rate fits (independent, 3-trial mean) — {title} — linear N")
     plt.grid(True, linestyle=":", alpha=0.5)
     plt.legend()
     plt.tight_layout()
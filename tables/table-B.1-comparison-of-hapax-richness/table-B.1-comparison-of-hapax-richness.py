@@ -4,28 +4,24 @@ author: "Uyen 'Rachel' Lai and Paul Sheridan"
 ###
 
 
-import json
+import sys
+from pathlib import Path
 from collections import Counter
 
-def calculate_hapax_richness(json_file):
-    # Load JSON
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "text-emulation"))
+from heapslaw.jsonstream import iter_documents
 
-    # Check format
-    if not isinstance(data, list):
-        raise ValueError("JSON must be a list of lists.")
-    
-    flat_words = []
-    for sublist in data:
+def calculate_hapax_richness(json_file):
+    # Stream the JSON one document at a time (raises ValueError unless it
+    # is a list) and count word frequencies as we go
+    word_counts = Counter()
+    total_tokens = 0
+    for sublist in iter_documents(json_file):
         if not isinstance(sublist, list):
             raise ValueError("Each item in the JSON must be a list of words.")
-        flat_words.extend(sublist)
-
-    # Count word frequencies
-    word_counts = Counter(flat_words)
+        word_counts.update(sublist)
+        total_tokens += len(sublist)
 
-    total_tokens = len(flat_words)
     total_types = len(word_counts)
     hapax_count = sum(1 for word, count in word_counts.items() if count == 1)
 
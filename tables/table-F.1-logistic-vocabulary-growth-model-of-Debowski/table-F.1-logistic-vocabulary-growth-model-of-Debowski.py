@@ -4,17 +4,21 @@ author: "Uyen 'Rachel' Lai and Paul Sheridan"
 ###
 
 import os
-import json
 import csv
-import random
+import sys
 from pathlib import Path
-from collections import Counter, defaultdict
+from collections import defaultdict
 
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 from scipy.optimize import curve_fit
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "text-emulation"))
+from heapslaw.corpus import EncodedCorpus, is_corpus_dir, load_corpus
+from heapslaw.jsonstream import iter_documents
+from heapslaw.growth import growth_curve, shuffled_order
+
 FILES = [
     ("PubMed_human_Close.json",                "Human"),
     ("PubMed_gptneo-125M_fewshot_Close.json", "GPT-Neo 125M"),
@@ -53,34 +57,31 @@ def g_paper(n, alpha, beta, gamma):
 
 def cumulative_NV_from_sublists(docs, cap_per_sublist, seed):
 
-    docs = [sub for sub in docs if isinstance(sub, list) and sub]
-
-    rng = random.Random(seed)
-    rng.shuffle(docs)
+    if isinstance(docs, EncodedCorpus):
+        corpus = docs.drop_empty()
+    else:
+        docs = [sub for sub in docs if isinstance(sub, list) and sub]
+        corpus = EncodedCorpus.from_docs(docs)
 
-    capped = [sub[:cap_per_sublist] for sub in docs]
+    # same permutation as random.Random(seed).shuffle(docs), applied to ids
+    corpus = corpus.capped(cap_per_sublist)
+    order = shuffled_order(corpus.n_docs, seed)
 
-    N = 0
-    seen = set()
-    NV = []
-    for sub in capped:
-        N += len(sub)
-        seen.update(sub)
-        NV.append([N, len(seen)])
-    return np.array(NV, dtype=float), capped
+    N, V = growth_curve(corpus, order)
+    return np.column_stack((N, V)).astype(float), corpus
 
 
 def load_docs(path):
     p = Path(path)
+    if is_corpus_dir(p):
+        return load_corpus(p), p.name
     if not p.exists() and Path(str(p) + ".json").exists():
         p = Path(str(p) + ".json")
     if not p.exists():
         raise FileNotFoundError(p)
-    with p.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise ValueError(f"{p} is not list[list[str]].")
-    return data, p.name
+    # stream the documents into an id-encoded corpus instead of json.load
+    corpus = EncodedCorpus.from_docs(sub for sub in iter_documents(p) if isinstance(sub, list))
+    return corpus, p.name
 
 def fit_g_paper(N, V):
 
@@ -121,11 +122,11 @@ def process_one_file(file_path, label, seed, rep_index):
     NV, capped = cumulative_NV_from_sublists(docs, TOKEN_CAP_PER_SUBLIST, seed)
     N, V = NV[:, 0], NV[:, 1]
 
-    all_words = [w for sub in capped for w in sub]
+    freqs = capped.frequencies()
     stats = {
-        "vocab_size": len(set(all_words)),
-        "total_words": len(all_words),
-        "singletons": sum(1 for c in Counter(all_words).values() if c == 1),
+        "vocab_size": int(np.count_nonzero(freqs)),
+        "total_words": int(freqs.sum()),
+        "singletons": int(np.count_nonzero(freqs == 1)),
     }
 
     alpha, beta, gamma, r2 = fit_g_paper(N, V)
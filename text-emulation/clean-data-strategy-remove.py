@@ -1,139 +1,38 @@
 import argparse
 import json
-import re
-import unicodedata
 import pandas as pd
-import contractions
-from spellchecker import SpellChecker
-from nltk.corpus import wordnet as wn
 import tqdm
-from multiprocessing import Pool, cpu_count
-from datasets import load_dataset
-import os
+import sys
+from itertools import islice
+from heapslaw.hfdata import iter_column
+from heapslaw.cleaning import CleanData, OpenVocab, OpenCloseVocab, SimpleProcessing, CHUNK_SIZE, wordnet_forms
 
-# Ensure WordNet corpus is loaded before threading
-wn.ensure_loaded()
+# Rows of a Hugging Face dataset that are cleaned
+ROWS = 10000
 
+# Ensure WordNet corpus is loaded before threading; the word form table is
+# loaded before the pool forks so the workers share it
+wordnet_forms()
 
-class DataProcessing:
-    def process(self, data: str):
-        pass
 
-
-class OpenVocab(DataProcessing):
-    def process(self, data: str):
-        return self.split_by_space(
-            self.expand_contractions(
-                self.remove_punctuation(
-                    self.remove_non_ascii(
-                        self.lower_case(data)))))
-
-    def lower_case(self, data: str):
-        return data.lower()
-
-    def remove_non_ascii(self, data: str):
-        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
-
-    def remove_punctuation(self, data: str):
-        data = re.sub(r'[.\']', '', data)
-        return re.sub(r'[^\w\s]|_', ' ', data).strip()
-
-    def expand_contractions(self, text: str):
-        return contractions.fix(text)
-
-    def split_by_space(self, data: str):
-        return data.split()
-
-
-class CloseVocab(DataProcessing):
-    def process(self, data: str):
-        return self.filter_words_in_vocab_database(
-            self.split_by_space(
-                self.expand_contractions(
-                    self.remove_punctuation(
-                        self.remove_non_ascii(
-                            self.lower_case(data))))))
-
-    def lower_case(self, data: str):
-        return data.lower()
-
-    def remove_non_ascii(self, data: str):
-        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
-
-    def remove_punctuation(self, data: str):
-        data = re.sub(r'[.\']', '', data)
-        return re.sub(r'[^\w\s]|_', ' ', data).strip()
-
-        return ' '.join(corrected_text)
-
-    def filter_words_in_vocab_database(self, words):
-        return [word for word in words if len(wn.synsets(word)) > 0]
-
-    def expand_contractions(self, text):
-        return contractions.fix(text)
-
-    def split_by_space(self, data: str):
-        return data.split()
-
-
-class SimpleProcessing(DataProcessing):
-    def process(self, data: str):
-        return self.split_by_space(
-            self.remove_punctuation(
-                self.remove_non_ascii(
-                    self.lower_case(data))))
-
-    def lower_case(self, data: str):
-        return data.lower()
-
-    def remove_non_ascii(self, data: str):
-        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
-
-    def remove_punctuation(self, data: str):
-        data = re.sub(r'[.\']', '', data)
-        return re.sub(r'[^\w\s]', ' ', data).strip()
-
-    def split_by_space(self, data: str):
-        return data.split(" ")
-
-
-class CleanData:
-    def __init__(self, strategy: DataProcessing = None):
-        self._strategy = strategy
-
-    def set_strategy(self, strategy: DataProcessing):
-        self._strategy = strategy
-
-    def clean(self, data: str):
-        if self._strategy:
-            return self._strategy.process(data)
-        else:
-            raise Exception('DataProcessing strategy not set')
-
-    def cleanTheArray(self, data):
-        with Pool(cpu_count()) as pool:
-            results = list(tqdm.tqdm(pool.imap(self.clean, data), total=len(data)))
-        return results
-
-    def saveData(self, data: str, name: str):
-        # Define the directory and file path
-        directory = 'data/cleandata/'
-        file_path = os.path.join(directory, f'{name}.json')
-        # Create the directory if it does not exist
-        os.makedirs(directory, exist_ok=True)
-        # Save the data to the file
-        with open(file_path, 'w') as file:
-            json.dump(data, file)
-        print(f"Data has been saved to {file_path} successfully.")
+def check_normalizer(data, strategies=None):
+    # Compare the fused normalizers with the original step-by-step chains
+    strategies = strategies or [OpenVocab(), SimpleProcessing()]
+    mismatches = 0
+    for strategy in strategies:
+        for text in tqdm.tqdm(data, desc=type(strategy).__name__):
+            if strategy.process(text) != strategy.reference_process(text):
+                mismatches += 1
+                print(f"{type(strategy).__name__} differs on: {text[:200]!r}")
+    print(f"{mismatches} mismatches on {len(data)} documents.")
+    return mismatches
 
 
 def loadData(type):
     if type == 1:
-        # Assuming 'load_dataset' is from Hugging Face's datasets library
-        my_dataset = load_dataset(args.inputdata)
-        df = pd.DataFrame(my_dataset['train'])
-        # Returning a subset of the data (first 10,000 rows)
-        return df[args.choosedata][0:10000]
+        # Only the chosen column of the first rows (10,000 by default) of the
+        # Hugging Face dataset is read; the values are streamed to the cleaner
+        return iter_column(args.inputdata, args.choosedata, args.rows, args.split)
     elif type == 0:
         # Loading JSON data from a file and converting it to a DataFrame
         with open(args.inputdata, 'r') as json_file:
@@ -150,12 +49,22 @@ if __name__ == "__main__":
     parser.add_argument('--inputdata', type=str, help='what is the name of the data')
     parser.add_argument('--choosedata', type=str, help='what is the name of the column?')
     parser.add_argument('--name', type=str, help='choose name for the outputfile')
+    parser.add_argument('--rows', type=int, default=ROWS, help='rows read from a Hugging Face dataset')
+    parser.add_argument('--split', type=str, default='train', help='split of the Hugging Face dataset')
+    parser.add_argument('--output_format', type=str, default='json', choices=['json', 'binary', 'both'],
+                        help='json list of lists, memory-mapped binary .corpus directory, or both')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE,
+                        help='documents sent to a cleaning worker at a time')
+    parser.add_argument('--workers', type=int, default=None, help='cleaning processes (default: all cores)')
+    parser.add_argument('--check_normalizer', type=int, default=0,
+                        help='only compare the fused normalizer with the original chain on this many documents')
     args = parser.parse_args()
 
     data = loadData(args.datasourse)
-    cleaner = CleanData(OpenVocab())
-    clean_data = cleaner.cleanTheArray(data)
-    cleaner.saveData(clean_data, args.name + "_Open")
-    cleaner = CleanData(CloseVocab())
-    clean_data = cleaner.cleanTheArray(data)
-    cleaner.saveData(clean_data, args.name + "_Close")
+    if args.check_normalizer:
+        sys.exit(1 if check_normalizer(list(islice(data, args.check_normalizer))) else 0)
+    # Open and Close vocabularies from a single pass over the data
+    strategy = OpenCloseVocab()
+    cleaner = CleanData(strategy)
+    cleaner.cleanTheArrayToFiles(data, [args.name + suffix for suffix in strategy.outputs], args.output_format,
+                                 args.chunk_size, args.workers)
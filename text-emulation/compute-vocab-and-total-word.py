@@ -2,6 +2,9 @@ import pickle
 import random
 import sqlite3
 
+from heapslaw.corpus import EncodedCorpus
+from heapslaw.growth import growth_points
+
 
 class ComputeVocabAndTotalWord:
     def process(self, data):
@@ -11,18 +14,8 @@ class ComputeVocabAndTotalWord:
 
 class NoDBCompute(ComputeVocabAndTotalWord):
     def process(self, data):
-        newarray = []
-        overall_total_words = 0
-        overall_unique_words = set()
-
-        for word_array in data:
-            if word_array is not None:  # Ensure the entry is not None
-
-                overall_total_words += len(word_array)
-                overall_unique_words.update(word_array)
-                newarray.append([overall_total_words, len(overall_unique_words)])
-
-        return newarray
+        # Intern the words to integer ids and grow V from first occurrences
+        return growth_points(EncodedCorpus.from_docs(data))
 
 
 class SQLiteCompute(ComputeVocabAndTotalWord):
@@ -1,12 +1,22 @@
 import argparse
 import json
 import random
-from transformers import GPT2Tokenizer
+from transformers import AutoTokenizer, GPT2TokenizerFast
 from abc import ABC, abstractmethod
+from multiprocessing import Pool, cpu_count
+from functools import partial
+import numpy as np
 import os
 import tqdm
+from heapslaw.prompts import PromptWriter, PROMPT_SUFFIX
 
-tokenizer = GPT2Tokenizer.from_pretrained('gpt2')
+tokenizer = GPT2TokenizerFast.from_pretrained('gpt2')
+
+# Where the prompt files go, one sub-directory per dataset
+PROMPT_DIR = "project/def-sheridan/rachel66/Heaps-Law-In-LLMs-Paper/data/prompt"
+
+# No prompt uses more than the first 200 tokens of a document (see divide_data)
+MAX_PROMPT_TOKENS = 200
 
 
 # Function to choose randomly from the data
@@ -21,27 +31,42 @@ class PromptStrategy(ABC):
     def generate_prompt_array(self, prompts, document_type, length):
         pass
 
-    def save_prompt(self, prompt, file_name):
+    def save_prompt(self, prompt, file_name, output_dir=PROMPT_DIR, prompt_format='json', id_tokenizer=None):
         # Extract the directory name from the file_name
         name_data = file_name.split("_")[2]
         # Ensure the directory exists
-        dir_path = os.path.abspath(f"project/def-sheridan/rachel66/Heaps-Law-In-LLMs-Paper/data/prompt/{name_data}")
+        dir_path = os.path.abspath(os.path.join(output_dir, name_data))
         os.makedirs(dir_path, exist_ok=True)
-        # Create a full file path (with a filename, not just a directory)
-        file_path = os.path.join(dir_path, f"{file_name}.json")
-        # Save the prompt to the file
-        with open(file_path, 'w') as file:
-            json.dump(prompt, file, indent=4)
-        print(f"Prompt saved to {file_path}")
+        if prompt_format in ('json', 'both'):
+            # Create a full file path (with a filename, not just a directory)
+            file_path = os.path.join(dir_path, f"{file_name}.json")
+            # Save the prompt to the file
+            with open(file_path, 'w') as file:
+                json.dump(prompt, file, indent=4)
+            print(f"Prompt saved to {file_path}")
+        if prompt_format in ('jsonl', 'both'):
+            # One {"text", "ids", "length"} record per line plus a line-offset
+            # index, so a generation job reads only its slice and does not
+            # tokenize the prompts again; the ids are those of the target
+            # model's tokenizer (GPT-2 unless one is given)
+            id_tokenizer = id_tokenizer or tokenizer
+            file_path = os.path.join(dir_path, f"{file_name}{PROMPT_SUFFIX}")
+            writer = PromptWriter(file_path)
+            for start in range(0, len(prompt), 1000):
+                chunk = prompt[start:start + 1000]
+                for text, ids in zip(chunk, id_tokenizer(chunk).input_ids):
+                    writer.write(text, ids)
+            writer.close()
+            print(f"Prompt saved to {file_path}")
 
 
 class ZeroShot(PromptStrategy):
 
     def generate_prompt_array(self, prompts, document_type, length):
-        prompt_list = prompts[0:60000]
+        prompt_list = range(min(60000, len(prompts)))
         zero_shot = []
         for i in tqdm.tqdm(range(len(prompt_list))):
-            token_prompt = divide_data(length, prompt_list[i])
+            token_prompt = prompts.divide(length, i)
             zero_shot_prompt = f"Please complete the unfinished {document_type}. {token_prompt[0]} =>"
             zero_shot.append(zero_shot_prompt)
         return zero_shot
@@ -51,34 +76,33 @@ class OneShot(PromptStrategy):
 
     def generate_prompt_array(self, prompts, document_type, length):
         one_shot_prompts = []
-        one_shot_example = prompts[60000:120000]
-        prompt_list = prompts[0:60000]
+        prompt_list = range(min(60000, len(prompts)))
         for i in tqdm.tqdm(range(len(prompt_list))):
-            example = divide_data(length, one_shot_example[i])
-            prompt = divide_data(length, prompt_list[i])
+            # the examples are documents 60000 to 120000
+            example = prompts.divide(length, 60000 + i)
+            prompt = prompts.divide(length, i)
             one_shot_prompts.append(
                 f"The following is an excerpt from a(n) {document_type}, followed by a completion of that excerpt. Please complete the unfinished {document_type} excerpt. {example[0]} => {example[1]} .{prompt[0]} =>")
         return one_shot_prompts
 
 
 class FewShot(PromptStrategy):
-    tokenizer = GPT2Tokenizer.from_pretrained('gpt2')
 
     def generate_prompt_array(self, prompts, document_type, length):
         few_shot_prompts = []
-        few_shot_example = prompts[60000::]
-        prompt_list = prompts[0:60000]
+        prompt_list = range(min(60000, len(prompts)))
         number_of_example = 3
         starting_point = 0
         end_point = 3
         for i in tqdm.tqdm(range(len(prompt_list))):
             example = ""
             for j in range(starting_point, end_point):
-                ex = divide_data(50, few_shot_example[j])
+                # the examples are the documents from 60000 on
+                ex = prompts.divide(50, 60000 + j)
                 example += f"{ex[0]} => {ex[1]}. "
             starting_point += number_of_example
             end_point += number_of_example
-            prompt = divide_data(length, prompt_list[i])
+            prompt = prompts.divide(length, i)
             few_shot_prompts.append(
                 f"The following is an excerpt from a(n) {document_type}, followed by a completion of that excerpt. Please complete the unfinished {document_type} excerpt. {example} .{prompt[0]} =>")
         return few_shot_prompts
@@ -91,8 +115,8 @@ class PromptContext:
     def generate_prompt_array(self, prompts, document_type, length):
         return self.strategy.generate_prompt_array(prompts, document_type, length)
 
-    def save_strategy_output(self, prompt, file_name):
-        return self.strategy.save_prompt(prompt, file_name)
+    def save_strategy_output(self, prompt, file_name, output_dir=PROMPT_DIR, prompt_format='json', id_tokenizer=None):
+        return self.strategy.save_prompt(prompt, file_name, output_dir, prompt_format, id_tokenizer)
 
 
 def LoadData(file_path):
@@ -109,7 +133,55 @@ def divide_data(number_of_token, prompt):
     return [prompt_text, example_text]
 
 
-def generate_all_prompt(prompts, name, document_type, length):
+def _encode_chunk(texts, keep):
+    return tokenizer([" ".join(text.split()) for text in texts], truncation=True, max_length=keep).input_ids
+
+
+class TokenizedDocuments:
+    """The source documents, tokenized once for all prompt strategies.
+
+    Chunks of documents are tokenized with the fast tokenizer on a process
+    pool, and the first `keep` ids of every document are kept as uint16
+    (the GPT-2 vocabulary fits).  `divide` returns what divide_data
+    returns for the same document; the decoded splits are computed in one
+    batch per prompt length and shared by ZeroShot, OneShot and FewShot.
+    """
+
+    def __init__(self, documents, keep=MAX_PROMPT_TOKENS, workers=None, chunk_size=2000):
+        self.keep = keep
+        self.ids = np.zeros((len(documents), keep), dtype=np.uint16)
+        self.lengths = np.zeros(len(documents), dtype=np.int64)
+        chunks = [documents[i:i + chunk_size] for i in range(0, len(documents), chunk_size)]
+        row = 0
+        with Pool(workers or cpu_count()) as pool:
+            for encoded in tqdm.tqdm(pool.imap(partial(_encode_chunk, keep=keep), chunks), total=len(chunks), desc="tokenizing"):
+                for ids in encoded:
+                    self.ids[row, :len(ids)] = ids
+                    self.lengths[row] = len(ids)
+                    row += 1
+        self._splits = {}
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _decode(self, start, stop):
+        rows = [self.ids[i, min(start, n):min(stop, n)].tolist() for i, n in enumerate(self.lengths.tolist())]
+        return tokenizer.batch_decode(rows)
+
+    def divide(self, number_of_token, index):
+        if number_of_token > self.keep:
+            raise ValueError(f"Only the first {self.keep} tokens of every document were kept.")
+        if number_of_token not in self._splits:
+            self._splits[number_of_token] = (self._decode(0, number_of_token),
+                                             self._decode(number_of_token, MAX_PROMPT_TOKENS))
+        prompt_texts, example_texts = self._splits[number_of_token]
+        return [prompt_texts[index], example_texts[index]]
+
+
+def generate_all_prompt(prompts, name, document_type, length, workers=None, output_dir=PROMPT_DIR,
+                        prompt_format='json', id_tokenizer=None):
+    # Every document is tokenized once here instead of once per strategy
+    prompts = TokenizedDocuments(prompts, max(MAX_PROMPT_TOKENS, length), workers)
     strategies = [ZeroShot(), OneShot(), FewShot()]
     # strategies = [FewShot()]
     # strategy_names = [ "few_shot_"]
@@ -118,7 +190,7 @@ def generate_all_prompt(prompts, name, document_type, length):
     for strategy, strategy_name in zip(strategies, strategy_names):
         context = PromptContext(strategy=strategy)
         generated_prompts = context.generate_prompt_array(prompts, document_type, length)
-        context.save_strategy_output(generated_prompts, strategy_name + name)
+        context.save_strategy_output(generated_prompts, strategy_name + name, output_dir, prompt_format, id_tokenizer)
 
 
 if __name__ == "__main__":
@@ -126,9 +198,18 @@ if __name__ == "__main__":
     parser.add_argument('--datasource', type=str, required=True, help='Path to the data source')
     parser.add_argument('--name', type=str, required=True, help='Name for the output file')
     parser.add_argument('--document_type', type=str, required=True, help='Command to generate prompts')
+    parser.add_argument('--workers', type=int, default=None, help='tokenizer processes (default: all cores)')
+    parser.add_argument('--output_dir', type=str, default=PROMPT_DIR, help='Directory for the prompt files')
+    parser.add_argument('--prompt_format', type=str, default='json', choices=['json', 'jsonl', 'both'],
+                        help='JSON array of prompts, JSON lines with token ids and a line index, or both')
+    parser.add_argument('--tokenizer', type=str, default=None,
+                        help='Tokenizer of the model that will read the JSON lines (its --model), so the stored '
+                             'ids are used as they are; default: gpt2')
 
     args = parser.parse_args()
 
     prompt_data = LoadData(args.datasource)
 
-    generate_all_prompt(prompt_data, args.name, args.document_type, 50)
+    id_tokenizer = AutoTokenizer.from_pretrained(args.tokenizer) if args.tokenizer else None
+    generate_all_prompt(prompt_data, args.name, args.document_type, 50, args.workers, args.output_dir,
+                        args.prompt_format, id_tokenizer)
@@ -0,0 +1,9 @@
+"""
+Shared helpers for the data cleaning and the vocabulary-growth statistics.
+
+The scripts in `text-emulation` and in the `tables`/`figures` folders are run
+from their own directories, so they put `text-emulation` on `sys.path` and
+import the modules of this package explicitly, e.g.
+
+    from heapslaw.spectrum import FrequencySpectrum
+"""
@@ -0,0 +1,13 @@
+import numpy as np
+
+
+def length_batches(lengths, batch_size):
+    """Indices of the prompts grouped into batches of similar token length.
+
+    Prompts are sorted by length, longest first (so a batch that does not
+    fit in memory fails right away), and cut into `batch_size` groups.  Each
+    batch is then only padded to its own longest prompt; write the results
+    back with the indices to restore the input order.
+    """
+    order = np.argsort(-np.asarray(lengths, dtype=np.int64), kind='stable')
+    return [order[i:i + batch_size].tolist() for i in range(0, len(order), batch_size)]
@@ -0,0 +1,99 @@
+import os
+import json
+import hashlib
+
+# Modules whose code produces the cached values; editing any of them misses
+# the cache without anyone having to remember to bump a version
+STATISTICS_MODULES = ("corpus.py", "growth.py", "fitting.py", "permutation.py")
+
+DIGEST_INDEX = "digests.json"
+
+
+def _file_paths(path):
+    """The file itself, or every file of a `.corpus` directory in a fixed order."""
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+
+def content_digest(path, chunk_size=1 << 20):
+    """sha256 of the content of a corpus file (or of all files of a .corpus directory)."""
+    digest = hashlib.sha256()
+    for file_path in _file_paths(path):
+        if file_path != path:
+            digest.update(os.path.basename(file_path).encode('utf-8'))
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(names=STATISTICS_MODULES):
+    """sha256 of the source of the statistics modules, independent of line endings."""
+    digest = hashlib.sha256()
+    for name in names:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as file:
+            digest.update(name.encode('utf-8'))
+            digest.update(file.read().replace(b'\r\n', b'\n'))
+    return digest.hexdigest()
+
+
+# Bump by hand only for changes outside STATISTICS_MODULES that change cached values
+CODE_VERSION = f"1:{source_digest()}"
+
+
+class ResultCache:
+    """Per-curve statistics keyed on what they are computed from.
+
+    An entry is stored under sha256(content digest, token cap, seed, code
+    version), so renaming a corpus costs nothing and changing its content,
+    the cap or the code simply misses.  Each entry is a small JSON file in
+    `directory`.  Content digests are remembered by (size, mtime) so
+    unchanged corpora are not re-read on every run.
+    """
+
+    def __init__(self, directory, version=CODE_VERSION):
+        self.directory = directory
+        self.version = version
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, DIGEST_INDEX)
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r') as file:
+                self._digests = json.load(file)
+        else:
+            self._digests = {}
+
+    def digest(self, path):
+        files = _file_paths(path)
+        stamp = [sum(os.path.getsize(p) for p in files), max(os.stat(p).st_mtime_ns for p in files)]
+        known = self._digests.get(os.path.abspath(path))
+        if known and known[:2] == stamp:
+            return known[2]
+        value = content_digest(path)
+        self._digests[os.path.abspath(path)] = stamp + [value]
+        return value
+
+    def key(self, digest, cap, seed):
+        return hashlib.sha256(f"{digest}:{cap}:{seed}:{self.version}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    def put(self, key, value):
+        # write then rename, so an interrupted run never leaves half an entry
+        path = self._entry_path(key)
+        with open(path + ".tmp", 'w') as file:
+            json.dump(value, file)
+        os.replace(path + ".tmp", path)
+
+    def save_index(self):
+        with open(self._index_path + ".tmp", 'w') as file:
+            json.dump(self._digests, file)
+        os.replace(self._index_path + ".tmp", self._index_path)
@@ -0,0 +1,337 @@
+import os
+import re
+import json
+import unicodedata
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+import contractions
+import tqdm
+from nltk.corpus import wordnet as wn
+
+from heapslaw.corpus import CorpusBuilder, CORPUS_SUFFIX
+from heapslaw.normalize import TextNormalizer
+from heapslaw.wordnet_forms import WordNetForms
+
+# Every word form WordNet knows, built once and cached on disk (see wordnet_forms)
+_wordnet_forms = None
+# Fused versions of the lower/ASCII/punctuation(/contractions/split) chains
+# below; each worker keeps its own per-token cache
+OPEN_NORMALIZER = TextNormalizer()
+SIMPLE_NORMALIZER = TextNormalizer(keep_underscore=True)
+# Documents sent to a worker per task
+CHUNK_SIZE = 256
+# Whitespace-separated tokens on each side of a WordCounter cut that must not
+# hold a contraction anchor (contraction keys span at most two tokens)
+COUNT_CONTEXT = 3
+
+
+def wordnet_forms():
+    # Loaded on first use; call it before a pool forks so the workers share
+    # the table instead of calling wn.synsets per token
+    global _wordnet_forms
+    if _wordnet_forms is None:
+        # Ensure WordNet corpus is loaded before threading
+        wn.ensure_loaded()
+        _wordnet_forms = WordNetForms()
+    return _wordnet_forms
+
+
+class DataProcessing:
+    def process(self, data: str):
+        pass
+
+
+class OpenVocab(DataProcessing):
+    def process(self, data: str):
+        return OPEN_NORMALIZER.words(data)
+
+    def reference_process(self, data: str):
+        return self.split_by_space(
+            self.expand_contractions(
+                self.remove_punctuation(
+                    self.remove_non_ascii(
+                        self.lower_case(data)))))
+
+    def lower_case(self, data: str):
+        return data.lower()
+
+    def remove_non_ascii(self, data: str):
+        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+
+    def remove_punctuation(self, data: str):
+        data = re.sub(r'[.\']', '', data)
+        return re.sub(r'[^\w\s]|_', ' ', data).strip()
+
+    def expand_contractions(self, text: str):
+        return contractions.fix(text)
+
+    def split_by_space(self, data: str):
+        return data.split()
+
+
+class CloseVocab(DataProcessing):
+    def process(self, data: str):
+        return self.filter_words_in_vocab_database(OPEN_NORMALIZER.words(data))
+
+    def reference_process(self, data: str):
+        return self.filter_words_in_vocab_database(
+            self.split_by_space(
+                self.expand_contractions(
+                    self.remove_punctuation(
+                        self.remove_non_ascii(
+                            self.lower_case(data))))))
+
+    def lower_case(self, data: str):
+        return data.lower()
+
+    def remove_non_ascii(self, data: str):
+        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+
+    def remove_punctuation(self, data: str):
+        data = re.sub(r'[.\']', '', data)
+        return re.sub(r'[^\w\s]|_', ' ', data).strip()
+
+    def filter_words_in_vocab_database(self, words):
+        forms = wordnet_forms()
+        return [word for word in words if word in forms]
+
+    def expand_contractions(self, text):
+        return contractions.fix(text)
+
+    def split_by_space(self, data: str):
+        return data.split()
+
+
+class OpenCloseVocab(CloseVocab):
+    # One pass for both vocabularies: the Open tokens are exactly what
+    # CloseVocab filters against WordNet, so the shared stages run once
+    outputs = ("_Open", "_Close")
+
+    def process(self, data: str):
+        words = OPEN_NORMALIZER.words(data)
+        return words, self.filter_words_in_vocab_database(words)
+
+
+class SimpleProcessing(DataProcessing):
+    def process(self, data: str):
+        return self.split_by_space(SIMPLE_NORMALIZER.text(data))
+
+    def reference_process(self, data: str):
+        return self.split_by_space(
+            self.remove_punctuation(
+                self.remove_non_ascii(
+                    self.lower_case(data))))
+
+    def lower_case(self, data: str):
+        return data.lower()
+
+    def remove_non_ascii(self, data: str):
+        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+
+    def remove_punctuation(self, data: str):
+        data = re.sub(r'[.\']', '', data)
+        return re.sub(r'[^\w\s]', ' ', data).strip()
+
+    def split_by_space(self, data: str):
+        return data.split(" ")
+
+
+class WordCounter:
+    """Word count of a text that arrives in pieces, e.g. a completion being generated.
+
+    `strategy` is OpenVocab or CloseVocab, whose words are the concatenation
+    of the words of the whitespace-separated tokens, except where a
+    contraction spans tokens (see `TextNormalizer`).  Text is therefore
+    counted once and moved out of the pending tail as soon as it is
+    followed by `context` complete tokens and no contraction anchor is
+    near the cut, so `count()` only re-cleans the last few tokens and
+    equals the count of the whole text.
+    """
+
+    def __init__(self, strategy, context=COUNT_CONTEXT):
+        self.strategy = strategy
+        self.context = context
+        self.words = 0
+        self.tail = ""
+
+    def add(self, text: str):
+        self.tail += text
+        tokens = list(re.finditer(r'\S+', self.tail))
+        anchored = [not OPEN_NORMALIZER.anchors.isdisjoint(OPEN_NORMALIZER.text(token.group()).split())
+                    for token in tokens]
+        # the last token may still grow, so it is never counted as complete
+        for cut in range(len(tokens) - 1 - self.context, 0, -1):
+            if not any(anchored[max(0, cut - self.context):cut + self.context]):
+                start = tokens[cut].start()
+                self.words += len(self.strategy.process(self.tail[:start]))
+                self.tail = self.tail[start:]
+                return
+
+    def count(self):
+        return self.words + len(self.strategy.process(self.tail))
+
+
+# The strategy is handed to each worker once, when the pool starts, instead
+# of being pickled with every task
+_worker_strategy = None
+
+
+def _init_worker(strategy):
+    global _worker_strategy
+    _worker_strategy = strategy
+
+
+def _clean_batch(batch):
+    return [_worker_strategy.process(text) for text in batch]
+
+
+class CleanData:
+    def __init__(self, strategy: DataProcessing = None):
+        self._strategy = strategy
+
+    def set_strategy(self, strategy: DataProcessing):
+        self._strategy = strategy
+
+    def clean(self, data: str):
+        if self._strategy:
+            return self._strategy.process(data)
+        else:
+            raise Exception('DataProcessing strategy not set')
+
+    def cleanBatches(self, data, chunk_size: int = CHUNK_SIZE, workers: int = None):
+        # Yield the cleaned documents batch by batch, in input order.  At most
+        # a few batches per worker are in flight, so memory does not grow
+        # with the corpus, and each task carries chunk_size documents
+        if not self._strategy:
+            raise Exception('DataProcessing strategy not set')
+        workers = workers or cpu_count()
+        data = iter(data)
+        with Pool(workers, initializer=_init_worker, initargs=(self._strategy,)) as pool:
+            pending = deque()
+            while True:
+                while len(pending) < 4 * workers:
+                    batch = list(islice(data, chunk_size))
+                    if not batch:
+                        break
+                    pending.append(pool.apply_async(_clean_batch, (batch,)))
+                if not pending:
+                    break
+                yield pending.popleft().get()
+
+    def cleanTheArray(self, data, chunk_size: int = CHUNK_SIZE, workers: int = None):
+        results = []
+        with tqdm.tqdm(total=len(data)) as progress:
+            for batch in self.cleanBatches(data, chunk_size, workers):
+                results.extend(batch)
+                progress.update(len(batch))
+        return results
+
+    def cleanTheArrayToFiles(self, data, names, output_format: str = 'json',
+                             chunk_size: int = CHUNK_SIZE, workers: int = None):
+        # Clean and save in one go: every result is written as soon as the
+        # pool hands it back, and a strategy with several outputs (such as
+        # OpenCloseVocab) returns one token list per name
+        writers = [CleanDataWriter(name, output_format) for name in names]
+        with tqdm.tqdm(total=len(data) if hasattr(data, '__len__') else None) as progress:
+            for batch in self.cleanBatches(data, chunk_size, workers):
+                for result in batch:
+                    if len(writers) == 1:
+                        result = (result,)
+                    for writer, words in zip(writers, result):
+                        writer.write(words)
+                progress.update(len(batch))
+        for writer in writers:
+            writer.close()
+
+    def saveData(self, data: str, name: str, output_format: str = 'json'):
+        writer = CleanDataWriter(name, output_format)
+        for words in data:
+            writer.write(words)
+        writer.close()
+
+
+class CleanDataWriter:
+    def __init__(self, name: str, output_format: str = 'json', chunk_docs: int = 10000,
+                 directory: str = 'data/cleandata/'):
+        # Create the directory if it does not exist
+        os.makedirs(directory, exist_ok=True)
+        self.file_path = None
+        self.file = None
+        self.corpus_path = None
+        self.builder = None
+        self.pending = []
+        self.chunk_docs = chunk_docs
+        if output_format in ('json', 'both'):
+            # written element by element; the file is the same as json.dump(data, file)
+            self.file_path = os.path.join(directory, f'{name}.json')
+            self.file = open(self.file_path, 'w', buffering=1 << 20)
+            self.file.write('[')
+            self.first = True
+        if output_format in ('binary', 'both'):
+            # vocabulary table + flat uint32 token ids + document offsets,
+            # which the stats scripts open with np.memmap instead of json.load
+            self.corpus_path = os.path.join(directory, f'{name}{CORPUS_SUFFIX}')
+            self.builder = CorpusBuilder()
+
+    def write(self, words):
+        if self.file is not None:
+            if not self.first:
+                self.file.write(', ')
+            self.first = False
+            self.file.write(json.dumps(words))
+        if self.builder is not None:
+            self.pending.append(words)
+            if len(self.pending) >= self.chunk_docs:
+                self.builder.add(self.pending)
+                self.pending = []
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(']')
+            self.file.close()
+            print(f"Data has been saved to {self.file_path} successfully.")
+        if self.builder is not None:
+            self.builder.add(self.pending)
+            self.pending = []
+            self.builder.build().save(self.corpus_path)
+            print(f"Data has been saved to {self.corpus_path} successfully.")
+
+
+class BackgroundCleaner:
+    """Clean decoded documents on a worker pool while the caller keeps working.
+
+    `submit` hands a batch of texts with their prompt indices to the pool
+    and returns at once, so the generation loop can start on the next batch
+    while the previous one is cleaned.  `save` waits for everything and
+    writes the cleaned corpora in index order.  Start it before loading a
+    model, so the workers are forked from a small process.
+    """
+
+    def __init__(self, strategy: DataProcessing, workers: int = None):
+        if isinstance(strategy, CloseVocab):
+            wordnet_forms()
+        self.pool = Pool(workers or cpu_count(), initializer=_init_worker, initargs=(strategy,))
+        self.pending = []
+
+    def submit(self, indices, texts):
+        self.pending.append((list(indices), self.pool.apply_async(_clean_batch, (list(texts),))))
+
+    def save(self, names, output_format: str = 'json', directory: str = 'data/cleandata/'):
+        results = {}
+        for indices, pending in self.pending:
+            results.update(zip(indices, pending.get()))
+        self.pool.close()
+        self.pool.join()
+        self.pending = []
+
+        writers = [CleanDataWriter(name, output_format, directory=directory) for name in names]
+        for index in sorted(results):
+            result = results[index]
+            if len(writers) == 1:
+                result = (result,)
+            for writer, words in zip(writers, result):
+                writer.write(words)
+        for writer in writers:
+            writer.close()
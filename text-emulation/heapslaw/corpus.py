@@ -0,0 +1,164 @@
+import os
+import json
+from itertools import chain, filterfalse, islice
+
+import numpy as np
+
+from heapslaw.jsonstream import iter_documents
+
+# A binary corpus is a directory <name>.corpus holding the vocabulary table,
+# the flat uint32 token ids and the int64 document offsets
+CORPUS_SUFFIX = ".corpus"
+VOCAB_FILE = "vocab.json"
+IDS_FILE = "ids.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+class EncodedCorpus:
+    """A list-of-lists corpus with every token interned to an integer id.
+
+    The tokens of all documents are stored back to back in `ids`; document i
+    is `ids[offsets[i]:offsets[i + 1]]` and `vocab[id]` is the word behind an
+    id.  Ids are handed out in order of first occurrence; None entries of
+    the input are skipped like `process()` always did.
+    """
+
+    def __init__(self, ids, offsets, vocab):
+        self.ids = ids
+        self.offsets = offsets
+        self.vocab = vocab
+
+    @classmethod
+    def from_docs(cls, docs, chunk_docs=10000):
+        """Encode any iterable of documents, e.g. `iter_documents(path)`.
+
+        The documents are consumed `chunk_docs` at a time, so a streamed
+        corpus never has to exist as one list of Python strings.
+        """
+        builder = CorpusBuilder()
+        docs = iter(docs)
+        while True:
+            chunk = list(islice(docs, chunk_docs))
+            if not chunk:
+                break
+            builder.add(chunk)
+        return builder.build()
+
+    def save(self, path):
+        """Write the corpus in the binary `.corpus` format (see `load_corpus`)."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, IDS_FILE), np.asarray(self.ids, dtype=np.uint32))
+        np.save(os.path.join(path, OFFSETS_FILE), np.asarray(self.offsets, dtype=np.int64))
+        with open(os.path.join(path, VOCAB_FILE), 'w', encoding='utf-8') as file:
+            json.dump(self.vocab, file, ensure_ascii=False)
+
+    @property
+    def n_docs(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_types(self):
+        return len(self.vocab)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def doc_index(self):
+        """Document number of every token in `ids`."""
+        return np.repeat(np.arange(self.n_docs, dtype=np.int64), self.lengths)
+
+    def iter_docs(self):
+        """Yield every document as a view into `ids` (no copy)."""
+        for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist()):
+            yield self.ids[start:end]
+
+    def drop_empty(self):
+        """Same corpus without the empty documents; `ids` is shared, not copied."""
+        lengths = self.lengths
+        if lengths.all():
+            return self
+        offsets = np.concatenate(([0], self.offsets[1:][lengths > 0]))
+        return EncodedCorpus(self.ids, offsets, self.vocab)
+
+    def capped(self, cap):
+        """Keep at most the first `cap` tokens of every document (`sublist[:cap]`)."""
+        lengths = self.lengths
+        if not len(lengths) or lengths.max() <= cap:
+            return self
+        position = np.arange(len(self.ids), dtype=np.int64) - np.repeat(self.offsets[:-1], lengths)
+        keep = position < cap
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(np.minimum(lengths, cap), out=offsets[1:])
+        return EncodedCorpus(self.ids[keep], offsets, self.vocab)
+
+    def frequencies(self):
+        """Token frequency of every type (zero for types dropped by `capped`)."""
+        return np.bincount(self.ids, minlength=self.n_types)
+
+    def docs(self):
+        """Decode back to a list of lists of strings."""
+        vocab = self.vocab
+        return [[vocab[i] for i in self.ids[start:end]]
+                for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+
+class CorpusBuilder:
+    """Encode documents batch by batch as they are produced (see `EncodedCorpus.from_docs`).
+
+    Only the uint32 ids are kept per document, so a producer such as the
+    cleaning pool can hand over its output as it goes and call `build()`
+    at the end.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.id_chunks = []
+        self.length_chunks = []
+
+    def add(self, docs):
+        """Append a list of documents; None entries are skipped."""
+        chunk = [sub for sub in docs if sub is not None]
+        if not chunk:
+            return
+        index = self.index
+        # dict.fromkeys keeps first-occurrence order and the new words
+        # are filtered and numbered in C, like the lookups below run in C
+        # through map(), so no Python code is executed per token
+        new_words = list(filterfalse(index.__contains__, dict.fromkeys(chain.from_iterable(chunk))))
+        index.update(zip(new_words, range(len(index), len(index) + len(new_words))))
+        lengths = np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk))
+        self.id_chunks.append(np.fromiter(map(index.__getitem__, chain.from_iterable(chunk)),
+                                          dtype=np.uint32, count=int(lengths.sum())))
+        self.length_chunks.append(lengths)
+
+    def build(self):
+        lengths = np.concatenate(self.length_chunks) if self.length_chunks else np.zeros(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ids = np.concatenate(self.id_chunks) if self.id_chunks else np.zeros(0, dtype=np.uint32)
+        return EncodedCorpus(ids, offsets, list(self.index))
+
+
+def is_corpus_dir(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, IDS_FILE))
+
+
+def load_corpus(path):
+    """Open a `.corpus` directory; ids and offsets are memory-mapped, not read."""
+    ids = np.load(os.path.join(path, IDS_FILE), mmap_mode='r')
+    offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode='r')
+    with open(os.path.join(path, VOCAB_FILE), 'r', encoding='utf-8') as file:
+        vocab = json.load(file)
+    return EncodedCorpus(ids, offsets, vocab)
+
+
+def read_corpus(path):
+    """EncodedCorpus from either a `.corpus` directory or a list-of-lists JSON file.
+
+    A JSON file is streamed one document at a time, not loaded as a whole.
+    """
+    if is_corpus_dir(path):
+        return load_corpus(path)
+    return EncodedCorpus.from_docs(iter_documents(path))
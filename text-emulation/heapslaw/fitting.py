@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def power_law(x, alpha, beta):
+    return alpha * np.power(x, beta)
+
+
+def fit_power_law(N, V, weights=None):
+    """Heaps' law V = alpha * N^beta for a single curve, see `fit_power_law_batch`.
+
+    Returns alpha, beta and R^2 like `alpha_beta` in cal-data-suf.py.
+    """
+    alpha, beta, r_squared = fit_power_law_batch([(N, V)], None if weights is None else [weights])[0]
+    return alpha, beta, r_squared
+
+
+def fit_power_law_batch(curves, weights=None, max_iter=200, tol=1e-12):
+    """Least-squares fit of V = alpha * N^beta to many (N, V) curves at once.
+
+    The curves are padded into one (curves x points) array and solved
+    together with Levenberg-Marquardt steps on the analytic Jacobian
+    dV/dalpha = N^beta, dV/dbeta = alpha N^beta log N.  Each curve starts
+    from the straight-line fit of log V on log N, which is already close to
+    the optimum, so only a few iterations are needed instead of curve_fit's
+    numeric derivatives from p0=[1, 1].  `weights` (one array per curve)
+    weight the squared residuals; R^2 is always the unweighted one that
+    `alpha_beta` reports.  Returns a (curves, 3) array of alpha, beta, R^2.
+    """
+    n_curves = len(curves)
+    size = max(len(N) for N, _ in curves)
+    X = np.ones((n_curves, size))
+    Y = np.zeros((n_curves, size))
+    W = np.zeros((n_curves, size))
+    for i, (N, V) in enumerate(curves):
+        X[i, :len(N)] = N
+        Y[i, :len(V)] = V
+        W[i, :len(N)] = 1.0 if weights is None else weights[i]
+    valid = W > 0
+    positive = X > 0
+    logX = np.log(np.where(valid & positive, X, 1.0))
+
+    def power(beta):
+        # N^beta, and 0 at N = 0 (alpha * 0^beta like power_law for beta > 0),
+        # so those points also get zero Jacobian rows
+        return np.where(positive, np.exp(beta[:, None] * logX), 0.0)
+
+    # warm start: weighted straight-line fit in log-log space
+    ok = valid & positive & (Y > 0)
+    w = np.where(ok, W, 0.0)
+    logY = np.log(np.where(ok, Y, 1.0))
+    sw = w.sum(axis=1)
+    mx = (w * logX).sum(axis=1) / sw
+    my = (w * logY).sum(axis=1) / sw
+    sxx = (w * (logX - mx[:, None]) ** 2).sum(axis=1)
+    sxy = (w * (logX - mx[:, None]) * (logY - my[:, None])).sum(axis=1)
+    beta = np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1.0), 1.0)
+    alpha = np.exp(my - beta * mx)
+
+    def cost(alpha, beta):
+        return (W * (Y - alpha[:, None] * power(beta)) ** 2).sum(axis=1)
+
+    damping = np.full(n_curves, 1e-3)
+    current = cost(alpha, beta)
+    active = np.ones(n_curves, dtype=bool)
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        xb = power(beta)
+        fitted = alpha[:, None] * xb
+        residual = Y - fitted
+        J_alpha = xb
+        J_beta = fitted * logX
+        a11 = (W * J_alpha * J_alpha).sum(axis=1)
+        a12 = (W * J_alpha * J_beta).sum(axis=1)
+        a22 = (W * J_beta * J_beta).sum(axis=1)
+        g1 = (W * J_alpha * residual).sum(axis=1)
+        g2 = (W * J_beta * residual).sum(axis=1)
+
+        # Marquardt-scaled damped normal equations, solved as 2x2 systems
+        d11 = a11 * (1.0 + damping)
+        d22 = a22 * (1.0 + damping)
+        det = d11 * d22 - a12 ** 2
+        det = np.where(det != 0, det, np.finfo(float).tiny)
+        step_alpha = (d22 * g1 - a12 * g2) / det
+        step_beta = (d11 * g2 - a12 * g1) / det
+
+        new_alpha = alpha + np.where(active, step_alpha, 0.0)
+        new_beta = beta + np.where(active, step_beta, 0.0)
+        trial = cost(new_alpha, new_beta)
+        better = active & np.isfinite(trial) & (trial <= current)
+
+        converged = better & (current - trial <= tol * np.maximum(current, np.finfo(float).tiny))
+        alpha = np.where(better, new_alpha, alpha)
+        beta = np.where(better, new_beta, beta)
+        current = np.where(better, trial, current)
+        damping = np.where(better, damping / 10.0, damping * 10.0)
+        active &= ~converged & (damping < 1e12)
+
+    fitted = alpha[:, None] * power(beta)
+    ss_res = (valid * (Y - fitted) ** 2).sum(axis=1)
+    mean = (valid * Y).sum(axis=1) / valid.sum(axis=1)
+    ss_tot = (valid * (Y - mean[:, None]) ** 2).sum(axis=1)
+    r_squared = 1 - ss_res / ss_tot
+    return np.column_stack((alpha, beta, r_squared))
+
+
+def summarize(values, level=0.95):
+    """Mean, standard deviation and central `level` interval of a sample."""
+    values = np.asarray(values, dtype=float)
+    tail = 100 * (1 - level) / 2
+    lo, hi = np.percentile(values, [tail, 100 - tail])
+    return {"mean": float(values.mean()), "sd": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+            "lo": float(lo), "hi": float(hi)}
@@ -0,0 +1,51 @@
+import random
+
+import numpy as np
+
+
+def shuffled_order(n_docs, seed):
+    """Document order produced by `random.Random(seed).shuffle(docs)`.
+
+    random.shuffle only depends on the length of the list and on the state
+    of the generator, so shuffling the indices gives exactly the permutation
+    the scripts used to apply to the documents themselves.
+    """
+    order = list(range(n_docs))
+    random.Random(seed).shuffle(order)
+    return np.array(order, dtype=np.int64)
+
+
+def first_occurrence(corpus, order=None):
+    """Position (in reading order) of the first document containing each type.
+
+    Types that do not occur at all get `corpus.n_docs`.
+    """
+    doc_of_token = corpus.doc_index()
+    if order is not None:
+        rank = np.empty(corpus.n_docs, dtype=np.int64)
+        rank[order] = np.arange(corpus.n_docs, dtype=np.int64)
+        doc_of_token = rank[doc_of_token]
+    first = np.full(corpus.n_types, corpus.n_docs, dtype=np.int64)
+    np.minimum.at(first, corpus.ids, doc_of_token)
+    return first
+
+
+def growth_curve(corpus, order=None):
+    """Cumulative (N, V) after every document of an EncodedCorpus.
+
+    `order` is a permutation of the documents (see `shuffled_order`); the
+    documents are read in their stored order when it is None.  Each type
+    adds one to V at the document where it first occurs, so V is a cumsum
+    of the bincount of first-occurrence positions.
+    """
+    lengths = corpus.lengths if order is None else corpus.lengths[order]
+    N = np.cumsum(lengths)
+    new_types = np.bincount(first_occurrence(corpus, order), minlength=corpus.n_docs + 1)
+    V = np.cumsum(new_types[:corpus.n_docs])
+    return N, V
+
+
+def growth_points(corpus, order=None):
+    """`growth_curve` as the [[N, V], ...] list the fitting code expects."""
+    N, V = growth_curve(corpus, order)
+    return np.column_stack((N, V)).tolist()
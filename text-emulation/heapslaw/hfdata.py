@@ -0,0 +1,54 @@
+import os
+
+from datasets import DatasetDict, config, load_dataset, load_dataset_builder, load_from_disk
+
+# Rows read from an Arrow dataset at a time
+BATCH_SIZE = 1000
+
+
+def _saved_to_disk(path):
+    # `Dataset.save_to_disk` / `DatasetDict.save_to_disk` leave one of these behind
+    return os.path.isdir(path) and any(os.path.exists(os.path.join(path, name))
+                                       for name in ('state.json', 'dataset_dict.json'))
+
+
+def _cached(source, split):
+    """`split` memory-mapped from the datasets cache if it was already prepared there, else None."""
+    builder = load_dataset_builder(source)
+    # the same test `download_and_prepare` uses to reuse a prepared dataset
+    if not os.path.exists(os.path.join(builder.cache_dir, config.DATASET_INFO_FILENAME)):
+        return None
+    return builder.as_dataset(split=split)
+
+
+def _iter_slices(dataset, column, limit):
+    dataset = dataset.select_columns([column])
+    rows = len(dataset) if limit is None else min(limit, len(dataset))
+    for start in range(0, rows, BATCH_SIZE):
+        yield from dataset[start:min(start + BATCH_SIZE, rows)][column]
+
+
+def iter_column(source, column, limit=None, split='train'):
+    """Yield the first `limit` values of one column of a Hugging Face dataset.
+
+    A directory written by `save_to_disk`, or a hub name, dataset script or
+    data directory already prepared in the datasets cache, is memory-mapped
+    and read in `BATCH_SIZE` row slices of that column only.  Only a dataset
+    that is not cached is streamed, so no more rows are downloaded or
+    decoded than are used.  Nothing goes through pandas.
+    """
+    if _saved_to_disk(source):
+        dataset = load_from_disk(source)
+        if isinstance(dataset, DatasetDict):
+            dataset = dataset[split]
+        yield from _iter_slices(dataset, column, limit)
+        return
+    dataset = _cached(source, split)
+    if dataset is not None:
+        yield from _iter_slices(dataset, column, limit)
+        return
+    dataset = load_dataset(source, split=split, streaming=True).select_columns([column])
+    if limit is not None:
+        dataset = dataset.take(limit)
+    for row in dataset:
+        yield row[column]
@@ -0,0 +1,103 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER = "0123456789.eE+-"
+
+
+def scan_elements(path, chunk_size=1 << 20, allow_object=False, encoding='utf-8'):
+    """Yield (start, end, element) for every element of a top-level JSON array.
+
+    With `allow_object` the values of a top-level JSON object (e.g.
+    wiki.json) are yielded too; otherwise anything but a list is rejected.
+    `start` and `end` are offsets in the decoded text of the file, so with
+    the latin-1 encoding, which maps every byte to one character, they are
+    byte offsets (the ASCII JSON syntax is unaffected).
+
+    The file is read in `chunk_size` pieces and each element is decoded as
+    soon as it is complete, so memory stays at one chunk plus one element.
+    """
+    with open(path, 'r', encoding=encoding, newline='') as file:
+        buffer = ""
+        base = 0  # offset of buffer[0] in the file
+        pos = 0
+        eof = False
+
+        def more():
+            nonlocal buffer, base, pos, eof
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            base += pos
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer) or not more():
+                    return
+
+        def decode():
+            while True:
+                try:
+                    element, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # most likely the element continues in the next chunk
+                    if eof or not more():
+                        raise
+                    continue
+                if (isinstance(element, (int, float)) and not eof
+                        and (end == len(buffer) or buffer[end] in _NUMBER) and more()):
+                    # a number may continue in the next chunk
+                    continue
+                return element, end
+
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] not in ('[{' if allow_object else '['):
+            raise ValueError(f"{path} is not a JSON list{' or object' if allow_object else ''}.")
+        closing = ']' if buffer[pos] == '[' else '}'
+        pos += 1
+
+        first = True
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError(f"{path} ends before the closing '{closing}'.")
+            if buffer[pos] == closing:
+                return
+            if not first:
+                if buffer[pos] != ',':
+                    raise ValueError(f"{path}: expected ',' at character {base + pos}.")
+                pos += 1
+                skip_whitespace()
+            first = False
+
+            if closing == '}':
+                # skip the key and the ':' of an object member
+                _, pos = decode()
+                skip_whitespace()
+                if pos >= len(buffer) or buffer[pos] != ':':
+                    raise ValueError(f"{path}: expected ':' at character {base + pos}.")
+                pos += 1
+                skip_whitespace()
+            start = base + pos
+            element, pos = decode()
+            yield start, base + pos, element
+
+
+def iter_documents(path, chunk_size=1 << 20, allow_object=False):
+    """Yield the elements of a top-level JSON array one at a time.
+
+    With `allow_object` the values of a top-level JSON object are yielded
+    too; otherwise anything but a list is rejected, as the corpus loaders
+    expect.  For the cleaned corpora (a list of lists of words) every
+    element is one document, and memory stays at one chunk plus one
+    document instead of the whole parsed corpus (see `scan_elements`).
+    """
+    for _, _, element in scan_elements(path, chunk_size, allow_object):
+        yield element
@@ -0,0 +1,83 @@
+import numpy as np
+
+# Lengths below this are counted one by one (exact quantiles); longer
+# documents only by power-of-two bin
+EXACT_LIMIT = 1 << 16
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class LengthStats:
+    """Document count, mean/variance, quantiles and histogram of document lengths in constant memory.
+
+    Sums are kept as Python integers, so the mean and the (population)
+    variance are exact however many documents are added.  Quantiles are
+    exact below `EXACT_LIMIT`; above it they are the lower end of the
+    power-of-two bin they fall in.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squares = 0
+        self.min = None
+        self.max = None
+        self.exact = np.zeros(EXACT_LIMIT, dtype=np.int64)
+        # long[k]: lengths with bit_length k (2**(k-1) <= length < 2**k)
+        self.long = np.zeros(64, dtype=np.int64)
+
+    def update(self, lengths):
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if not len(lengths):
+            return
+        self.count += len(lengths)
+        self.total += int(lengths.sum())
+        self.total_squares += sum(int(length) * int(length) for length in lengths.tolist())
+        low, high = int(lengths.min()), int(lengths.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        short = lengths[lengths < EXACT_LIMIT]
+        self.exact += np.bincount(short, minlength=EXACT_LIMIT)
+        for length in lengths[lengths >= EXACT_LIMIT].tolist():
+            self.long[length.bit_length()] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        if not self.count:
+            return 0.0
+        return (self.total_squares - self.total * self.total / self.count) / self.count
+
+    def quantile(self, q):
+        """Smallest length with at least a fraction `q` of the documents at or below it."""
+        if not self.count:
+            return None
+        rank = max(1, int(np.ceil(q * self.count)))
+        cumulative = np.cumsum(self.exact)
+        if cumulative[-1] >= rank:
+            return int(np.searchsorted(cumulative, rank))
+        cumulative = cumulative[-1] + np.cumsum(self.long)
+        return 1 << (int(np.searchsorted(cumulative, rank)) - 1)
+
+    def histogram(self):
+        """(from, to, count) for the bins 0, 1, 2-3, 4-7, ... that are not empty."""
+        bins = self.long.copy()
+        for k in range(EXACT_LIMIT.bit_length()):
+            low, high = (1 << k) >> 1, 1 << k
+            bins[k] += self.exact[low:high].sum()
+        return [(int((1 << k) >> 1), int((1 << k) - 1) if k else 0, int(n)) for k, n in enumerate(bins) if n]
+
+    def summary(self):
+        return {
+            "documents": self.count,
+            "tokens": self.total,
+            "mean": self.mean,
+            "variance": self.variance,
+            "std": self.variance ** 0.5,
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {str(q): self.quantile(q) for q in QUANTILES},
+            "histogram": [{"from": low, "to": high, "count": n} for low, high, n in self.histogram()],
+        }
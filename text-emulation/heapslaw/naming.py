@@ -0,0 +1,34 @@
+import re
+
+# Expected filename format of the cleaned corpora:
+# <corpus>_<model_name>[-<model_size>_<prompt>_]<vocab>.json (or .corpus)
+FILENAME_PATTERN = re.compile(
+    r'^(?P<corpus>[^_]+)_'                   # Corpus: e.g. PubMed or hn
+    r'(?P<model_name>[^-_]+)'                 # Model Name: e.g. human or pythia
+    r'(?:-'                                  # Start optional group for non-human models
+    r'(?P<model_size>[\d\.]+[bBmM])_'         # Model Size: e.g. 2.8b
+    r'(?P<prompt>[^_]+)_'                     # Prompt Type: e.g. fewshot
+    r')?'                                    # End optional group
+    r'(?P<vocab>[^\.]+)\.(?:json|corpus)$'   # Vocab Setting: e.g. open or close
+)
+
+
+def parse_file_name(file_name):
+    """Split a cleaned-corpus file name into its (lower-cased) components.
+
+    Returns a dict with the keys corpus, model_name, model_size, prompt and
+    vocab; every value is None when the name does not follow the pattern.
+    """
+    match = FILENAME_PATTERN.match(file_name)
+    if not match:
+        return dict(corpus=None, model_name=None, model_size=None, prompt=None, vocab=None)
+    return {key: (value.lower() if value else None) for key, value in match.groupdict().items()}
+
+
+def file_label(file_name):
+    """Human readable label for plots, e.g. 'pubmed gptneo 1.3b fewshot'."""
+    parts = parse_file_name(file_name)
+    if parts["corpus"] is None:
+        return file_name
+    fields = [parts["corpus"], parts["model_name"], parts["model_size"], parts["prompt"]]
+    return " ".join(field for field in fields if field)
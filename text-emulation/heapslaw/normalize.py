@@ -0,0 +1,89 @@
+import re
+import unicodedata
+from itertools import chain
+
+import contractions
+
+# Largest number of distinct raw tokens remembered per process before the
+# cache is emptied again
+CACHE_SIZE = 2_000_000
+
+
+def _punctuation_table(keep_underscore):
+    """`str.translate` table doing both `remove_punctuation` substitutions on ASCII text.
+
+    Built by running the two original regexes on every ASCII character, so
+    the table agrees with them by construction.
+    """
+    pattern = r'[^\w\s]' if keep_underscore else r'[^\w\s]|_'
+    table = {}
+    for code in range(128):
+        char = chr(code)
+        replaced = re.sub(pattern, ' ', re.sub(r'[.\']', '', char))
+        if replaced != char:
+            table[code] = replaced or None
+    return table
+
+
+def _anchor_words():
+    """Words at least one of which appears in every match of a multi-word contraction.
+
+    `contractions.fix` only rewrites whole alphanumeric runs, so on cleaned
+    text every key without whitespace matches a single token and can be
+    applied token by token.  Keys such as "to cause" span tokens; a document
+    containing the last word of such a key is fixed as a whole instead.
+    """
+    keys = contractions.replacers[(True, True)]
+    return {key.lower().split()[-1] for key in keys if any(ch.isspace() for ch in key) and key.split()}
+
+
+class TextNormalizer:
+    """The cleaning chain lower -> NFKD/ASCII -> punctuation -> contractions -> split, fused.
+
+    `text` replaces the first three steps by one `lower`, an NFKD pass only
+    for non-ASCII documents and a single `translate`.  `words` additionally
+    expands contractions and splits like `OpenVocab.process`, remembering
+    the result for every distinct whitespace-separated token, so a word form
+    that recurs across the corpus is normalized only once per process.
+    """
+
+    def __init__(self, keep_underscore=False, cache_size=CACHE_SIZE):
+        self.table = _punctuation_table(keep_underscore)
+        self.anchors = _anchor_words()
+        self.cache_size = cache_size
+        self._cache = {}
+        self._spanning = set()
+
+    def ascii_lower(self, data: str):
+        data = data.lower()
+        if data.isascii():
+            return data
+        return unicodedata.normalize('NFKD', data).encode('ascii', 'ignore').decode('utf-8', 'ignore')
+
+    def text(self, data: str):
+        """`remove_punctuation(remove_non_ascii(lower_case(data)))`."""
+        return self.ascii_lower(data).translate(self.table).strip()
+
+    def _add(self, raw):
+        parts = raw.translate(self.table).split()
+        self._cache[raw] = list(chain.from_iterable(contractions.fix(part).split() for part in parts))
+        if not self.anchors.isdisjoint(parts):
+            self._spanning.add(raw)
+
+    def words(self, data: str):
+        """`split_by_space(expand_contractions(text(data)))`."""
+        text = self.ascii_lower(data)
+        tokens = text.split()
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        # lookups and concatenation run in C through map()/chain
+        entries = list(map(self._cache.get, tokens))
+        if None in entries:
+            for raw in tokens:
+                if raw not in self._cache:
+                    self._add(raw)
+            entries = list(map(self._cache.__getitem__, tokens))
+        if not self._spanning.isdisjoint(tokens):
+            # a contraction may span several tokens here
+            return contractions.fix(text.translate(self.table).strip()).split()
+        return list(chain.from_iterable(entries))
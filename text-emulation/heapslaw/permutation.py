@@ -0,0 +1,85 @@
+import numpy as np
+
+from heapslaw.fitting import fit_power_law_batch
+from heapslaw.rarefaction import weighted_unseen
+
+# Largest (permutations x type-document pairs) block gathered at once
+MAX_BLOCK = 20_000_000
+
+
+class DocumentIncidence:
+    """Which documents contain which type, for growth curves under reordering.
+
+    Only the distinct (type, document) pairs of a corpus matter for V after
+    k documents, so they are extracted once: `doc` lists the containing
+    documents of type 0, then of type 1, ..., and `starts[t]` is where the
+    documents of type t begin.  `doc_freq[t]` is the number of documents
+    containing t.  Types that do not occur (e.g. cut off by `capped`) are
+    dropped.
+    """
+
+    def __init__(self, corpus):
+        n_docs = corpus.n_docs
+        keys = np.unique(corpus.ids.astype(np.int64) * n_docs + corpus.doc_index())
+        types, self.doc = np.divmod(keys, n_docs)
+        self.doc_freq = np.bincount(types)
+        self.doc_freq = self.doc_freq[self.doc_freq > 0]
+        self.starts = np.concatenate(([0], np.cumsum(self.doc_freq)[:-1]))
+        self.lengths = np.asarray(corpus.lengths)
+        self.n_docs = n_docs
+
+    @property
+    def n_types(self):
+        return len(self.doc_freq)
+
+    def curves(self, orders):
+        """(N, V) after every document for each row of `orders` (one permutation per row)."""
+        orders = np.atleast_2d(orders)
+        n_perm, n_docs = orders.shape
+        rank = np.empty_like(orders)
+        np.put_along_axis(rank, orders, np.arange(n_docs)[None, :], axis=1)
+
+        # first document (in each order) containing each type
+        first = np.minimum.reduceat(rank[:, self.doc], self.starts, axis=1)
+
+        row = np.arange(n_perm, dtype=np.int64)[:, None] * n_docs
+        new_types = np.bincount((first + row).ravel(), minlength=n_perm * n_docs)
+        V = np.cumsum(new_types.reshape(n_perm, n_docs), axis=1)
+        N = np.cumsum(self.lengths[orders], axis=1)
+        return N, V
+
+    def iter_permutation_curves(self, n_permutations, seed, block=MAX_BLOCK):
+        """Yield (N, V) blocks for `n_permutations` random document orders."""
+        per_block = max(1, block // max(1, len(self.doc)))
+        rng = np.random.default_rng(seed)
+        done = 0
+        while done < n_permutations:
+            size = min(per_block, n_permutations - done)
+            orders = np.argsort(rng.random((size, self.n_docs)), axis=1)
+            yield self.curves(orders)
+            done += size
+
+    def expected_curve(self, k=None):
+        """Exact E[N(k)] and E[V(k)] over all document orders, no sampling.
+
+        A type contained in d of the n documents is still unseen after k
+        random documents with probability C(n - d, k) / C(n, k), so
+        E[V(k)] = V - sum_d f_d C(n - d, k) / C(n, k), where f_d is the
+        number of types with document frequency d.
+        """
+        k = np.arange(1, self.n_docs + 1) if k is None else np.asarray(k)
+        d, f = np.unique(self.doc_freq, return_counts=True)
+        EV = self.n_types - weighted_unseen(self.n_docs, d, f.astype(float), k)
+        EN = k * self.lengths.mean()
+        return EN, EV
+
+
+def permutation_fits(incidence, n_permutations, seed):
+    """Heaps' law fit of every one of `n_permutations` random document orders.
+
+    Each block of curves is fitted in one batched call.  Returns an
+    (n_permutations, 3) array of alpha, beta and R^2.
+    """
+    blocks = [fit_power_law_batch(list(zip(N, V)))
+              for N, V in incidence.iter_permutation_curves(n_permutations, seed)]
+    return np.concatenate(blocks)
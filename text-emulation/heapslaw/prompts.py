@@ -0,0 +1,66 @@
+import os
+import json
+
+import numpy as np
+
+from heapslaw.jsonstream import iter_documents
+
+# Prompt files: one JSON record {"text", "ids", "length"} per line, with the
+# byte offset of every line (and of the end of the file) in <file>.idx.npy
+PROMPT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx.npy"
+
+
+class PromptWriter:
+    """Write prompt records one line at a time and their line-offset index at the end."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.offsets = [0]
+
+    def write(self, text, ids):
+        ids = [int(i) for i in ids]
+        line = json.dumps({"text": text, "ids": ids, "length": len(ids)}).encode('utf-8') + b"\n"
+        self.file.write(line)
+        self.offsets.append(self.offsets[-1] + len(line))
+
+    def close(self):
+        self.file.close()
+        np.save(self.path + INDEX_SUFFIX, np.asarray(self.offsets, dtype=np.int64))
+
+
+def line_offsets(path):
+    """Byte offsets of the lines of `path`; read from the index file, or rebuilt if it is missing or stale."""
+    index_path = path + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        offsets = np.load(index_path)
+        if len(offsets) and offsets[-1] == os.path.getsize(path):
+            return offsets
+    offsets = [0]
+    with open(path, 'rb') as file:
+        for line in file:
+            offsets.append(offsets[-1] + len(line))
+    offsets = np.asarray(offsets, dtype=np.int64)
+    np.save(index_path, offsets)
+    return offsets
+
+
+def read_prompts(path, start=None, end=None):
+    """Prompt records `start:end` (slice semantics) of a .jsonl or JSON prompt file.
+
+    For .jsonl files only the requested lines are read, starting at the
+    offset the index gives.  A JSON list of prompt strings (the older
+    format) is streamed and gives records without token ids.
+    """
+    if not path.endswith(PROMPT_SUFFIX):
+        texts = list(iter_documents(path))[start:end]
+        return [{"text": text, "ids": None, "length": None} for text in texts]
+    offsets = line_offsets(path)
+    rows = range(len(offsets) - 1)[start:end]
+    if rows.step != 1 or not len(rows):
+        return []
+    with open(path, 'rb') as file:
+        file.seek(offsets[rows.start])
+        data = file.read(int(offsets[rows.stop] - offsets[rows.start]))
+    return [json.loads(line) for line in data.splitlines()]
@@ -0,0 +1,62 @@
+import numpy as np
+from scipy.special import gammaln
+
+# Largest (points x distinct sizes) block evaluated at once
+MAX_BLOCK = 20_000_000
+
+
+def unseen_probability(total, size, draws):
+    """C(total - size, draws) / C(total, draws).
+
+    The probability that none of `size` marked items is among `draws` items
+    drawn without replacement from `total`.  `size` and `draws` broadcast.
+    """
+    size, draws = np.broadcast_arrays(np.asarray(size, dtype=float), np.asarray(draws, dtype=float))
+    out = np.zeros(size.shape)
+    ok = draws <= total - size
+    s, d = size[ok], draws[ok]
+    out[ok] = np.exp(gammaln(total - s + 1) - gammaln(total - s - d + 1)
+                     - gammaln(total + 1) + gammaln(total - d + 1))
+    return out
+
+
+def weighted_unseen(total, sizes, weights, draws, block=MAX_BLOCK):
+    """sum_j weights[j] * unseen_probability(total, sizes[j], draws), for every draw count."""
+    sizes = np.asarray(sizes)
+    draws = np.atleast_1d(draws)
+    out = np.zeros(len(draws))
+    step = max(1, block // max(1, len(sizes)))
+    for lo in range(0, len(draws), step):
+        d = draws[lo:lo + step]
+        out[lo:lo + step] = unseen_probability(total, sizes[None, :], d[:, None]) @ weights
+    return out
+
+
+def frequency_spectrum(freqs):
+    """(m, V_m): the distinct token frequencies and how many types have each."""
+    freqs = np.asarray(freqs)
+    m, V_m = np.unique(freqs[freqs > 0], return_counts=True)
+    return m, V_m
+
+
+def rarefaction_curve(freqs, n):
+    """Exact expected vocabulary E[V(n)] of a random n-token subsample.
+
+    `freqs` are the token frequencies of the types (e.g.
+    `EncodedCorpus.frequencies()`).  By the hypergeometric formula
+    E[V(n)] = V - sum_m V_m C(N - m, n) / C(N, n), so every point costs
+    O(number of distinct frequencies) regardless of the corpus size.
+    """
+    m, V_m = frequency_spectrum(freqs)
+    N = int(np.sum(m * V_m))
+    n = np.atleast_1d(np.asarray(n))
+    if np.any(n > N):
+        raise ValueError(f"Cannot subsample more than the {N} tokens of the corpus.")
+    return V_m.sum() - weighted_unseen(N, m, V_m.astype(float), n)
+
+
+def rarefaction_points(freqs, n_points):
+    """[[n, E[V(n)]], ...] at `n_points` evenly spaced sample sizes up to N."""
+    N = int(np.sum(freqs))
+    n = np.unique(np.linspace(N / n_points, N, n_points).round().astype(np.int64))
+    return np.column_stack((n, rarefaction_curve(freqs, n))).tolist()
@@ -0,0 +1,108 @@
+import os
+import json
+import random
+from array import array
+
+import numpy as np
+
+from heapslaw.jsonstream import scan_elements
+
+# Byte spans of all documents of a corpus, saved next to it as <file>.docs.npz
+INDEX_SUFFIX = ".docs.npz"
+
+# Characters read at a time while scanning a .json corpus for its spans
+SCAN_CHUNK = 1 << 22
+
+
+def _scan_json(path):
+    """Yield the (start, end) byte span of every element of a top-level JSON list
+    (or of every value of a top-level JSON object).
+
+    Decoding the file as latin-1 maps every byte to one character, so the
+    offsets of the shared scanner are byte offsets in the file.
+    """
+    for start, end, _ in scan_elements(path, SCAN_CHUNK, allow_object=True, encoding='latin-1'):
+        yield start, end
+
+
+def _scan_jsonl(path):
+    """Yield the (start, end) byte span of every non-blank line of a JSON lines file."""
+    offset = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                yield offset, offset + len(line.rstrip(b'\r\n'))
+            offset += len(line)
+
+
+def _load_index(path):
+    index_path = path + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return None
+    with np.load(index_path) as index:
+        if int(index["size"]) != os.path.getsize(path):
+            return None
+        return index["spans"]
+
+
+def _save_index(path, spans):
+    # np.savez adds ".npz" to names that do not end with it, so the
+    # temporary file keeps that suffix
+    tmp_path = path + ".tmp" + INDEX_SUFFIX
+    np.savez(tmp_path, spans=spans, size=np.int64(os.path.getsize(path)))
+    os.replace(tmp_path, path + INDEX_SUFFIX)
+
+
+def iter_spans(path):
+    """Byte spans of the documents of a .json/.jsonl corpus, from its index or by one scan.
+
+    A scan writes the index when it finishes, so later selections (another
+    seed or sample size) do not read the corpus again.
+    """
+    spans = _load_index(path)
+    if spans is not None:
+        yield from map(tuple, spans.tolist())
+        return
+    scanned = array('q')
+    for span in (_scan_jsonl(path) if path.endswith('.jsonl') else _scan_json(path)):
+        scanned.extend(span)
+        yield span
+    _save_index(path, np.frombuffer(scanned, dtype=np.int64).reshape(-1, 2))
+
+
+class Reservoir:
+    """Uniform sample of `k` items from a stream of unknown length (Algorithm R).
+
+    With the same seed and the same stream the same items are kept.
+    """
+
+    def __init__(self, k, seed):
+        self.k = k
+        self.rng = random.Random(seed)
+        self.seen = 0
+        self.items = []
+
+    def add(self, item):
+        if self.seen < self.k:
+            self.items.append(item)
+        else:
+            j = self.rng.randrange(self.seen + 1)
+            if j < self.k:
+                self.items[j] = item
+        self.seen += 1
+
+
+def sample_spans(path, k, seed):
+    """(number, start, end) of `k` randomly chosen documents, in file order, and the document count."""
+    reservoir = Reservoir(k, seed)
+    for number, (start, end) in enumerate(iter_spans(path)):
+        reservoir.add((number, start, end))
+    return sorted(reservoir.items), reservoir.seen
+
+
+def read_documents(path, spans):
+    """Parse only the documents at the given (number, start, end) spans."""
+    with open(path, 'rb') as file:
+        for _, start, end in spans:
+            file.seek(start)
+            yield json.loads(file.read(end - start))
@@ -0,0 +1,70 @@
+import os
+import json
+import uuid
+import pickle
+
+# One JSON line per finished shard: {"shard": <file name>, "indices": [...]}.
+# Every line is appended with a leading newline, so a line torn by a crash is
+# ended by the next append and skipped when the manifest is read
+MANIFEST_FILE = "manifest.jsonl"
+
+
+class ShardedOutput:
+    """Generated sequences flushed to numbered pickle shards as batches finish.
+
+    Every shard holds {prompt index: sequence} for one batch, where the
+    index is the position of the prompt in the whole input file, so runs
+    over different `start_point`/`end_point` ranges can share a directory,
+    also at the same time: shard names carry the first prompt index of the
+    batch and a random suffix, and every manifest line is a single append.
+    A shard is written to a temporary file and renamed before its manifest
+    line is appended, so after a crash the manifest only lists complete
+    shards and a restarted job skips exactly the prompts listed there.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.entries = []
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as file:
+                for line in file:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # blank, or the line being appended when a job was stopped
+                        continue
+
+    def completed(self):
+        """Indices of all prompts that already have a sequence on disk."""
+        return {index for entry in self.entries for index in entry["indices"]}
+
+    def write(self, indices, sequences):
+        name = f"shard-{min(indices):09d}-{uuid.uuid4().hex[:8]}.pkl"
+        path = os.path.join(self.directory, name)
+        with open(path + ".tmp", 'wb') as file:
+            pickle.dump(dict(zip(indices, sequences)), file)
+        os.replace(path + ".tmp", path)
+
+        entry = {"shard": name, "indices": [int(index) for index in indices]}
+        with open(self.manifest_path, 'a') as file:
+            file.write("\n" + json.dumps(entry))
+            file.flush()
+            os.fsync(file.fileno())
+        self.entries.append(entry)
+
+    def read(self, indices):
+        """The sequences of `indices`, in that order."""
+        wanted = set(indices)
+        found = {}
+        for entry in self.entries:
+            if wanted.isdisjoint(entry["indices"]):
+                continue
+            with open(os.path.join(self.directory, entry["shard"]), 'rb') as file:
+                shard = pickle.load(file)
+            found.update((index, sequence) for index, sequence in shard.items() if index in wanted)
+        missing = wanted.difference(found)
+        if missing:
+            raise ValueError(f"{len(missing)} prompts have no generated sequence in {self.directory}.")
+        return [found[index] for index in indices]
@@ -0,0 +1,70 @@
+import numpy as np
+
+
+class FrequencySpectrum:
+    """Running word-frequency spectrum of a growing corpus.
+
+    `spectrum[m]` is the number of types that occurred exactly m times so far
+    (so `spectrum[1]` are the hapax legomena and `spectrum[2]` the dis
+    legomena).  Adding a token only moves one type from class m to class
+    m + 1, so every update is O(1) and V, the hapax count, etc. can be read
+    off after each document without rescanning the counts.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.spectrum = {}
+        self.N = 0
+
+    def update(self, words):
+        if isinstance(words, np.ndarray):
+            words = words.tolist()  # token ids of a binary corpus
+        counts = self.counts
+        spectrum = self.spectrum
+        for word in words:
+            c = counts.get(word, 0)
+            if c:
+                left = spectrum[c] - 1
+                if left:
+                    spectrum[c] = left
+                else:
+                    del spectrum[c]
+            counts[word] = c + 1
+            spectrum[c + 1] = spectrum.get(c + 1, 0) + 1
+        self.N += len(words)
+
+    @property
+    def V(self):
+        return len(self.counts)
+
+    def types_with_frequency(self, m):
+        return self.spectrum.get(m, 0)
+
+    @property
+    def hapax(self):
+        return self.types_with_frequency(1)
+
+    @property
+    def dis_legomena(self):
+        return self.types_with_frequency(2)
+
+    def hapax_rate(self):
+        return self.hapax / self.V if self.V > 0 else np.nan
+
+
+def cumulative_spectrum(docs):
+    """Feed `docs` through a FrequencySpectrum and record it after every document.
+
+    Returns the arrays N (tokens so far), V (types so far), H (hapax count)
+    and D (dis legomena count), one entry per document.
+    """
+    tracker = FrequencySpectrum()
+    N_list, V_list, H_list, D_list = [], [], [], []
+    for sub in docs:
+        tracker.update(sub)
+        N_list.append(tracker.N)
+        V_list.append(tracker.V)
+        H_list.append(tracker.hapax)
+        D_list.append(tracker.dis_legomena)
+    return (np.array(N_list, dtype=float), np.array(V_list, dtype=float),
+            np.array(H_list, dtype=float), np.array(D_list, dtype=float))
@@ -0,0 +1,91 @@
+import os
+import sys
+
+import nltk
+from nltk.corpus import wordnet as wn
+from nltk.corpus.reader.wordnet import POS_LIST
+
+# Precomputed on first use; one form per line after a version header.  Kept
+# next to the package so every script finds it whatever directory it runs in
+FORMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wordnet', 'lemma_forms.txt')
+
+
+def _header():
+    return f"# nltk {nltk.__version__} wordnet {wn.get_version()}"
+
+
+def _candidates():
+    """Lemma names, their exceptional forms and suffix-rule inflections."""
+    forms = set(wn.all_lemma_names())
+    for pos in POS_LIST:
+        lemmas = list(wn.all_lemma_names(pos))
+        for old, new in wn.MORPHOLOGICAL_SUBSTITUTIONS[pos]:
+            # morphy turns <stem>+old into <stem>+new, so go the other way
+            forms.update(lemma[:len(lemma) - len(new)] + old for lemma in lemmas if lemma.endswith(new))
+    for exceptions in getattr(wn, '_exception_map', {}).values():
+        forms.update(exceptions)
+    return forms
+
+
+def build_forms():
+    """Every candidate form for which `wn.synsets(form)` is not empty.
+
+    `wn.synsets(word)` is non-empty exactly when `wn.morphy(word.lower())`
+    finds a base form for one of the parts of speech, so each candidate is
+    checked with morphy and only confirmed forms are kept.
+    """
+    return {form for form in _candidates() if wn.morphy(form) is not None}
+
+
+def load_forms(path=FORMS_FILE):
+    """The confirmed forms, read from `path` or built and saved there first."""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            if file.readline().rstrip('\n') == _header():
+                return set(file.read().split('\n')) - {''}
+    forms = build_forms()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        file.write(_header() + '\n')
+        file.write('\n'.join(sorted(forms)))
+    os.replace(path + '.tmp', path)
+    return forms
+
+
+class WordNetForms:
+    """`word in WordNetForms(...)` gives the same answer as `len(wn.synsets(word)) > 0`.
+
+    Known forms are a set lookup.  Anything else (morphy can also strip
+    suffixes repeatedly, so the forms are not a finite list) is decided by
+    `wn.morphy` once per distinct word and remembered.
+    """
+
+    def __init__(self, forms=None):
+        self.forms = load_forms() if forms is None else forms
+        self._others = {}
+
+    def __contains__(self, word):
+        lemma = word.lower()
+        if lemma in self.forms:
+            return True
+        found = self._others.get(lemma)
+        if found is None:
+            found = self._others[lemma] = wn.morphy(lemma) is not None
+        return found
+
+
+def check_parity(words, forms=None):
+    """Words for which the lookup and `wn.synsets` disagree (should be empty)."""
+    forms = WordNetForms(forms)
+    return [word for word in words if (word in forms) != (len(wn.synsets(word)) > 0)]
+
+
+if __name__ == "__main__":
+    # python -m heapslaw.wordnet_forms [words.txt]: build the table and check it
+    forms = load_forms()
+    print(f"{len(forms)} WordNet forms in {FORMS_FILE}")
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as file:
+            words = file.read().split()
+        mismatches = check_parity(words, forms)
+        print(f"{len(mismatches)} mismatches with wn.synsets: {mismatches[:20]}")
@@ -0,0 +1,432 @@
+import gc
+import os
+import importlib.util
+import pickle
+import sys
+import time
+import argparse
+
+import torch
+from transformers import AutoTokenizer, GPT2TokenizerFast, GPTNeoForCausalLM, GPTNeoXForCausalLM, OPTForCausalLM
+from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heapslaw.batching import length_batches
+from heapslaw.shards import ShardedOutput
+from heapslaw.prompts import read_prompts
+from heapslaw.cleaning import BackgroundCleaner, CloseVocab, OpenCloseVocab, WordCounter
+
+
+def pythia_checkpoint(model_path):
+    # Pythia is read at its final training step and cached next to the script
+    model_name = model_path.split("/")[1]
+    return {"revision": "step143000", "cache_dir": f"./{model_name}/step143000"}
+
+
+# How every model family is loaded and how long its prompts may be
+MODEL_REGISTRY = {
+    "pythia": {"model": GPTNeoXForCausalLM, "tokenizer": AutoTokenizer,
+               "pretrained": pythia_checkpoint, "max_length": 854, "batch": None, "position_ids": True},
+    "gpt-neo": {"model": GPTNeoForCausalLM, "tokenizer": GPT2TokenizerFast,
+                "pretrained": lambda model_path: {}, "max_length": 854, "batch": None, "position_ids": True},
+    # OPT derives the positions from the attention mask itself
+    "opt": {"model": OPTForCausalLM, "tokenizer": AutoTokenizer,
+            "pretrained": lambda model_path: {}, "max_length": None, "batch": 8, "position_ids": False},
+}
+
+# Sampling settings of every run
+MAX_NEW_TOKENS = 300
+SAMPLING = {"do_sample": True,  # Enable sampling
+            "top_p": 0.9,  # Use nucleus sampling (top-p)
+            "temperature": 1,  # Increase temperature for more randomness
+            "top_k": 50}
+# How often (in new tokens) a row's word count is checked against the budget
+BUDGET_CHECK_EVERY = 8
+
+PRECISIONS = {"float32": torch.float32, "bfloat16": torch.bfloat16, "float16": torch.float16}
+
+# (precision, int8) combinations compared by --benchmark
+CPU_MODES = [("float32", False), ("bfloat16", False), ("float32", True)]
+
+
+def load_model(family, model_path, device, precision="float32", int8=False, low_memory=False):
+    """Model and tokenizer of a registered family, in the requested execution mode.
+
+    `low_memory` streams the checkpoint into the model (low_cpu_mem_usage,
+    needs the accelerate package) instead of building a randomly
+    initialised fp32 copy first, and `precision` is applied while loading,
+    so a bfloat16 model never exists in fp32.  `int8` replaces every Linear
+    layer by a dynamically quantized int8 one, which only runs on the CPU.
+    """
+    spec = MODEL_REGISTRY[family]
+    pretrained = spec["pretrained"](model_path)
+    if int8 and (precision != "float32" or device.type != "cpu"):
+        raise ValueError("int8 dynamic quantization needs --precision float32 and --device cpu.")
+    if low_memory and importlib.util.find_spec("accelerate") is None:
+        raise ImportError("--low_memory needs the accelerate package (pip install accelerate).")
+
+    model = spec["model"].from_pretrained(model_path, torch_dtype=PRECISIONS[precision],
+                                          low_cpu_mem_usage=low_memory, **pretrained)
+    if int8:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model = model.to(device)
+    model.eval()
+
+    tokenizer = spec["tokenizer"].from_pretrained(model_path, **pretrained)
+    # Set padding token
+    tokenizer.pad_token = tokenizer.eos_token
+    return model, tokenizer
+
+
+def model_bytes(model):
+    """Memory taken by the weights (packed int8 weights included)."""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in (value if isinstance(value, tuple) else (value,)):
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.element_size() * tensor.nelement()
+    return total
+
+
+class LLMsGeneration:
+    def __init__(self, model, tokenizer, device, start_point, end_point, batch_size, max_length=None,
+                 prefix_cache=False, position_ids=True, word_budget=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.startPoint = start_point
+        self.endPoint = end_point
+        self.rawDoc = None
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer.padding_side = 'left'
+        # Shared prompt prefix whose keys/values are computed once, see _prefix_generate
+        self.prefix_cache = prefix_cache
+        self.position_ids = position_ids
+        self.prefix_ids = []
+        self.prefix_past = None
+        # Stop a row once its completion has this many cleaned words
+        self.word_budget = word_budget
+        self.budget_strategy = CloseVocab()
+        # Throughput counters, see report()
+        self.prompts_done = 0
+        self.tokens_generated = 0
+        self.seconds = 0.0
+
+    def stored_ids_match(self, records):
+        """Whether the token ids saved with the prompts are what this model's tokenizer gives.
+
+        create-prompt.py stores the ids of its --tokenizer (GPT-2 by default);
+        prompts written for another tokenizer are tokenized again.
+        """
+        if any(record["ids"] is None for record in records):
+            return False
+        encoded = self.tokenizer([record["text"] for record in records]).input_ids
+        return all(list(ids) == record["ids"] for ids, record in zip(encoded, records))
+
+    def loadArray(self, file_path, batch_size, shards=None, cleaner=None, limit=None):
+        # A .jsonl prompt file is read from its line index, only this job's slice
+        records = read_prompts(file_path, self.startPoint, self.endPoint)[:limit]
+        prompts = [record["text"] for record in records]
+
+        # Positions of the prompts in the whole input file; those already in
+        # the shards of an earlier, interrupted run are not generated again
+        first = self.startPoint or 0
+        positions = list(range(first, first + len(prompts)))
+        done = shards.completed() if shards is not None else set()
+        todo = [k for k, position in enumerate(positions) if position not in done]
+        if len(todo) < len(prompts):
+            print(f"Skipping {len(prompts) - len(todo)} prompts that were already generated.")
+
+        # Tokenize without padding; every batch is padded to its own longest
+        # prompt after grouping prompts of similar length together
+        truncation = {"max_length": self.max_length} if self.max_length else {}
+        if todo and self.stored_ids_match([records[k] for k in todo[:8]]):
+            encoded = [records[k]["ids"][:self.max_length] for k in todo]
+        else:
+            encoded = self.tokenizer([prompts[k] for k in todo], truncation=True, **truncation).input_ids if todo else []
+
+        if self.prefix_cache and encoded:
+            self.set_prefix(encoded)
+        # Only the part after the shared prefix differs between prompts
+        suffixes = [ids[len(self.prefix_ids):] for ids in encoded]
+
+        texts = [None] * len(prompts)
+        for indices in length_batches([len(ids) for ids in suffixes], batch_size or 1):
+            start = time.perf_counter()
+            with torch.inference_mode():
+                if self.prefix_past is not None:
+                    input_ids, generated = self._prefix_generate([suffixes[i] for i in indices])
+                else:
+                    batch = self.tokenizer.pad({"input_ids": [encoded[i] for i in indices]}, return_tensors="pt").to(self.device)
+                    input_ids, generated = batch.input_ids, self._sample(batch.input_ids, batch.attention_mask)
+            sequences = generated.cpu().numpy()
+            self.seconds += time.perf_counter() - start
+            self.prompts_done += len(indices)
+            # pad is eos, so this counts the new tokens up to the end of each text
+            self.tokens_generated += int((sequences[:, input_ids.shape[1]:] != self.tokenizer.pad_token_id).sum())
+
+            batch_positions = [positions[todo[i]] for i in indices]
+            if shards is not None:
+                # Flush the batch right away so a restarted job can skip it;
+                # the prompt width tells where each completion starts
+                shards.write(batch_positions, [(sequence, input_ids.shape[1]) for sequence in sequences])
+
+            # Put every text back at the position of its prompt; the cleaner
+            # works on this batch while the model generates the next one
+            decoded = self.decode(sequences)
+            for i, text in zip(indices, decoded):
+                texts[todo[i]] = text
+            if cleaner is not None:
+                # only the completions, not the prompts, go into the corpora
+                cleaner.submit(batch_positions, self.decode(sequences[:, input_ids.shape[1]:]))
+
+        # Prompts generated by an earlier run are decoded from the shards
+        resumed = [k for k, text in enumerate(texts) if text is None]
+        if resumed:
+            stored = shards.read([positions[k] for k in resumed])
+            decoded = self.decode([sequence for sequence, _ in stored])
+            for k, text in zip(resumed, decoded):
+                texts[k] = text
+            if cleaner is not None:
+                completions = self.decode([sequence[width:] for sequence, width in stored])
+                cleaner.submit([positions[k] for k in resumed], completions)
+
+        self.rawDoc = texts
+
+    def _sample(self, input_ids, attention_mask, past_key_values=None):
+        if self.word_budget:
+            return self._budget_sample(input_ids, attention_mask, past_key_values)
+        kwargs = {} if past_key_values is None else {"past_key_values": past_key_values}
+        return self.model.generate(input_ids,
+                                   attention_mask=attention_mask,
+                                   max_new_tokens=MAX_NEW_TOKENS,
+                                   pad_token_id=self.tokenizer.pad_token_id,
+                                   **SAMPLING,
+                                   **kwargs
+                                   )
+
+    def _over_budget(self, tokens, counter, decoded):
+        # More than word_budget Close words (a subset of the Open words), so
+        # the budget-th word is complete and both vocabularies reach the cap.
+        # Only the tokens after `decoded` are decoded and cleaned.  The last
+        # tokens of a character split over tokens (up to 3 more bytes in
+        # UTF-8) are left for the next check, so the character is complete
+        end = len(tokens)
+        text = self.tokenizer.decode(tokens[decoded:end], skip_special_tokens=True)
+        while text.endswith("\ufffd") and end > max(decoded, len(tokens) - 3):
+            end -= 1
+            text = self.tokenizer.decode(tokens[decoded:end], skip_special_tokens=True)
+        counter.add(text)
+        return counter.count() > self.word_budget, end
+
+    def _budget_sample(self, input_ids, attention_mask, past=None):
+        """Sample like generate() but retire every row as soon as it has enough words.
+
+        A row stops at eos, after MAX_NEW_TOKENS, or once the cleaned words
+        of its completion exceed `word_budget` (checked every
+        BUDGET_CHECK_EVERY tokens on a running count per row, so each token
+        is decoded and cleaned about once); finished rows are removed from
+        the batch and from the key/value cache, so no token is generated for
+        them that the analysis would cut off anyway.  `past` may hold the
+        keys/values of all but the last input token (see _prefix_generate).
+        """
+        sample = SAMPLING.get("do_sample", False)
+        warpers = LogitsProcessorList()
+        if sample:
+            if SAMPLING.get("temperature", 1) != 1:
+                warpers.append(TemperatureLogitsWarper(SAMPLING["temperature"]))
+            if SAMPLING.get("top_k"):
+                warpers.append(TopKLogitsWarper(SAMPLING["top_k"]))
+            if SAMPLING.get("top_p", 1) < 1:
+                warpers.append(TopPLogitsWarper(SAMPLING["top_p"]))
+        eos = self.tokenizer.eos_token_id
+
+        size = input_ids.shape[0]
+        new_tokens = [[] for _ in range(size)]
+        counters = [WordCounter(self.budget_strategy) for _ in range(size)]
+        decoded = [0] * size
+        active = torch.arange(size, device=self.device)
+        sequences = input_ids
+        step_ids = input_ids if past is None else input_ids[:, -1:]
+        for step in range(MAX_NEW_TOKENS):
+            kwargs = {}
+            if self.position_ids:
+                positions = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+                kwargs["position_ids"] = positions[:, -step_ids.shape[1]:]
+            out = self.model(step_ids, past_key_values=past, attention_mask=attention_mask, use_cache=True, **kwargs)
+            scores = warpers(sequences, out.logits[:, -1, :].float())
+            if sample:
+                next_tokens = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1)
+            else:
+                next_tokens = scores.argmax(dim=-1, keepdim=True)
+
+            done = []
+            for row, (index, token) in enumerate(zip(active.tolist(), next_tokens[:, 0].tolist())):
+                new_tokens[index].append(token)
+                if token == eos:
+                    done.append(row)
+                elif len(new_tokens[index]) % BUDGET_CHECK_EVERY == 0:
+                    over, decoded[index] = self._over_budget(new_tokens[index], counters[index], decoded[index])
+                    if over:
+                        done.append(row)
+            keep = sorted(set(range(len(active))).difference(done))
+            if not keep:
+                break
+
+            step_ids = next_tokens
+            sequences = torch.cat([sequences, next_tokens], dim=1)
+            attention_mask = torch.cat([attention_mask, torch.ones_like(next_tokens, dtype=attention_mask.dtype)], dim=1)
+            past = out.past_key_values
+            if done:
+                rows = torch.tensor(keep, device=self.device)
+                active, step_ids, sequences, attention_mask = (active[rows], step_ids[rows], sequences[rows],
+                                                              attention_mask[rows])
+                past = tuple(tuple(tensor.index_select(0, rows) for tensor in layer) for layer in past)
+
+        # Same layout as generate(): the input, then the new tokens padded on the right
+        width = max(map(len, new_tokens))
+        padded = torch.full((size, width), self.tokenizer.pad_token_id, dtype=input_ids.dtype, device=input_ids.device)
+        for index, tokens in enumerate(new_tokens):
+            padded[index, :len(tokens)] = torch.tensor(tokens, dtype=input_ids.dtype)
+        return torch.cat([input_ids, padded], dim=1)
+
+    def set_prefix(self, encoded):
+        """Run the model once over the token prefix that all prompts share.
+
+        The templated prompts of create-prompt.py all start with the same
+        instruction.  Its keys/values are kept and reused by every batch
+        (at least one token of every prompt is left over for the batch).
+        """
+        prefix = os.path.commonprefix(encoded)[:max(0, min(map(len, encoded)) - 1)]
+        if list(prefix) == self.prefix_ids:
+            return
+        self.prefix_ids = list(prefix)
+        self.prefix_past = None
+        if len(self.prefix_ids) > 1:
+            with torch.inference_mode():
+                ids = torch.tensor([self.prefix_ids], device=self.device)
+                self.prefix_past = self.model(ids, use_cache=True).past_key_values
+            print(f"Reusing the keys/values of a {len(self.prefix_ids)}-token prefix shared by all prompts.")
+        else:
+            self.prefix_ids = []
+
+    def _prefix_generate(self, suffixes):
+        # Layout of a batch: [prefix][left padding][suffix].  The suffix minus
+        # its last token is prefilled on top of the cached prefix; generate()
+        # then only feeds the last token, as it does with any past.
+        batch = self.tokenizer.pad({"input_ids": suffixes}, return_tensors="pt").to(self.device)
+        size, length = batch.input_ids.shape
+        prefix = torch.tensor([self.prefix_ids], device=self.device).expand(size, -1)
+        input_ids = torch.cat([prefix, batch.input_ids], dim=1)
+        attention_mask = torch.cat([torch.ones_like(prefix, dtype=batch.attention_mask.dtype), batch.attention_mask], dim=1)
+        past = tuple(tuple(tensor.expand(size, *tensor.shape[1:]) for tensor in layer) for layer in self.prefix_past)
+        if length > 1:
+            kwargs = {}
+            if self.position_ids:
+                # padding in the middle must not shift the positions of the suffix
+                positions = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+                kwargs["position_ids"] = positions[:, len(self.prefix_ids):-1]
+            past = self.model(batch.input_ids[:, :-1], past_key_values=past, attention_mask=attention_mask[:, :-1],
+                              use_cache=True, **kwargs).past_key_values
+        return input_ids, self._sample(input_ids, attention_mask, past_key_values=past)
+
+    def decode(self, data):
+        return self.tokenizer.batch_decode(data, skip_special_tokens=True)
+
+    def report(self, mode):
+        seconds = max(self.seconds, 1e-9)
+        print(f"{mode}: {self.prompts_done} prompts, {self.tokens_generated} new tokens in {self.seconds:.1f}s "
+              f"({self.tokens_generated / seconds:.1f} tokens/s, {self.prompts_done / seconds:.2f} prompts/s, "
+              f"weights {model_bytes(self.model) / 2 ** 30:.2f} GiB)")
+
+
+def mode_name(device, precision, int8):
+    return f"{device.type}/{'int8' if int8 else precision}"
+
+
+def generation(args, family, model, tokenizer, device):
+    return LLMsGeneration(model, tokenizer, device, args.start_point, args.end_point, args.batch,
+                          max_length=MODEL_REGISTRY[family]["max_length"],
+                          prefix_cache=args.prefix_cache,
+                          position_ids=MODEL_REGISTRY[family]["position_ids"],
+                          word_budget=args.word_budget)
+
+
+def benchmark(args, family, device):
+    # Same prompts under every CPU execution mode, one model at a time
+    for precision, int8 in CPU_MODES:
+        model, tokenizer = load_model(family, args.model, device, precision, int8, args.low_memory)
+        llms_generation = generation(args, family, model, tokenizer, device)
+        llms_generation.loadArray(args.input, args.batch, limit=args.benchmark)
+        llms_generation.report(mode_name(device, precision, int8))
+        del model, tokenizer, llms_generation
+        gc.collect()
+
+
+def main(family=None):
+    parser = argparse.ArgumentParser()
+    if family is None:
+        parser.add_argument('--family', required=True, choices=sorted(MODEL_REGISTRY), help="Model family")
+    parser.add_argument('--input', type=str, help="Input JSON file path")
+    parser.add_argument('--output', type=str, help="Output file path to save generated results")
+    parser.add_argument('--model', default=None, type=str, help="Pretrained model path")
+    parser.add_argument('--batch', default=MODEL_REGISTRY[family]["batch"] if family else None, type=int,
+                        help="Batch size for generation")
+    parser.add_argument('--start_point', default=None, type=int, help="Start index of the prompts in the input file")
+    parser.add_argument('--end_point', default=None, type=int, help="End index of the prompts in the input file")
+    parser.add_argument('--shard_dir', default=None, type=str, help="Directory of the resumable output shards (default: <output>_shards)")
+    parser.add_argument('--clean_name', default=None, type=str, help="Also write cleaned <name>_Open/<name>_Close corpora while generating")
+    parser.add_argument('--clean_format', default='json', type=str, choices=['json', 'binary', 'both'], help="Format of the cleaned corpora")
+    parser.add_argument('--clean_dir', default='data/cleandata/', type=str, help="Directory of the cleaned corpora")
+    parser.add_argument('--clean_workers', default=None, type=int, help="Cleaning processes (default: all cores)")
+    parser.add_argument('--device', default=None, type=str, choices=['cpu', 'cuda'], help="Default: cuda if available")
+    parser.add_argument('--precision', default='float32', type=str, choices=sorted(PRECISIONS), help="Weight and compute dtype")
+    parser.add_argument('--int8', action='store_true', help="Dynamically quantize the Linear layers to int8 (CPU only)")
+    parser.add_argument('--low_memory', action='store_true', help="Load the weights with low peak RAM (needs accelerate)")
+    parser.add_argument('--prefix_cache', action='store_true',
+                        help="Compute the prompt prefix shared by all prompts once and reuse its keys/values")
+    parser.add_argument('--word_budget', default=None, type=int,
+                        help="Stop a row once its completion has more cleaned words than this (e.g. 225, the analysis cap)")
+    parser.add_argument('--benchmark', default=None, type=int,
+                        help="Only time this many prompts under every CPU mode (float32, bfloat16, int8) and exit")
+    args = parser.parse_args()
+    family = family or args.family
+
+    # Decoded batches are cleaned on a worker pool while generation goes on;
+    # the pool is started before the model is loaded
+    strategy = OpenCloseVocab()
+    cleaner = BackgroundCleaner(strategy, args.clean_workers) if args.clean_name and not args.benchmark else None
+
+    device = torch.device(args.device or ("cuda" if torch.cuda.is_available() else "cpu"))
+    if args.benchmark:
+        benchmark(args, family, torch.device("cpu"))
+        return
+
+    model, tokenizer = load_model(family, args.model, device, args.precision, args.int8, args.low_memory)
+
+    # Initialize LLMsGeneration instance
+    llms_generation = generation(args, family, model, tokenizer, device)
+
+    # Load array and generate text
+    shard_dir = args.shard_dir or os.path.splitext(args.output)[0] + "_shards"
+    llms_generation.loadArray(args.input, args.batch, ShardedOutput(shard_dir), cleaner)
+    llms_generation.report(mode_name(device, args.precision, args.int8))
+
+    # Define the output directory and file path
+    output_dir = os.path.dirname(args.output)
+
+    # Create the directory if it does not exist
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    with open(args.output, 'wb') as file:
+        pickle.dump(llms_generation.rawDoc, file)
+
+    if cleaner is not None:
+        cleaner.save([args.clean_name + suffix for suffix in strategy.outputs], args.clean_format, args.clean_dir)
+    print("done")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import argparse
+from collections import Counter
+
+import torch
+from tokenizers import ByteLevelBPETokenizer
+from transformers import GPT2TokenizerFast, GPTNeoConfig, GPTNeoXConfig, OPTConfig
+
+import engine
+from engine import MODEL_REGISTRY, LLMsGeneration, load_model
+from heapslaw.cleaning import OpenVocab
+from heapslaw.shards import ShardedOutput
+
+# Tiny randomly initialised models, built from a config so the check runs
+# offline on a CPU in seconds; every family goes through the same engine code
+# (padding, position ids, past handling) as the real checkpoints
+CONFIGS = {
+    "pythia": lambda size, layers, vocab, eos: GPTNeoXConfig(
+        vocab_size=vocab, hidden_size=size, num_hidden_layers=layers, num_attention_heads=4,
+        intermediate_size=4 * size, max_position_embeddings=1024, bos_token_id=eos, eos_token_id=eos),
+    "gpt-neo": lambda size, layers, vocab, eos: GPTNeoConfig(
+        vocab_size=vocab, hidden_size=size, num_layers=layers, num_heads=4,
+        attention_types=[[["global", "local"], layers // 2]], window_size=256, max_position_embeddings=1024,
+        bos_token_id=eos, eos_token_id=eos),
+    "opt": lambda size, layers, vocab, eos: OPTConfig(
+        vocab_size=vocab, hidden_size=size, num_hidden_layers=layers, num_attention_heads=4, ffn_dim=4 * size,
+        word_embed_proj_dim=size, max_position_embeddings=1024, bos_token_id=eos, eos_token_id=eos,
+        pad_token_id=eos),
+}
+WORDS = ("the of and to in is was for on that with as by at from his her it an were are which this be or has "
+         "had not first new one their after").split()
+
+
+def build_tokenizer(directory, seed=0):
+    rng = random.Random(seed)
+    text = [" ".join(rng.choice(WORDS) for _ in range(200)) for _ in range(200)]
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(text, vocab_size=500, special_tokens=["<|endoftext|>"])
+    path = os.path.join(directory, "tokenizer.json")
+    bpe.save(path)
+    return GPT2TokenizerFast(tokenizer_file=path, bos_token="<|endoftext|>", eos_token="<|endoftext|>",
+                             unk_token="<|endoftext|>")
+
+
+def build_model(family, directory, tokenizer, size, layers, eos_like=None):
+    torch.manual_seed(0)
+    config = CONFIGS[family](size, layers, len(tokenizer), tokenizer.eos_token_id)
+    model = MODEL_REGISTRY[family]["model"](config)
+    if eos_like is not None:
+        # eos takes the place of token `eos_like` in the output, so greedy
+        # rows end where they would first have produced that token
+        with torch.no_grad():
+            output = model.get_output_embeddings().weight
+            output[tokenizer.eos_token_id] = output[eos_like] * 1.05
+    path = os.path.join(directory, family)
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return path
+
+
+def make_prompts(count, prefix_words, seed=1):
+    # Like the templated prompts: one shared instruction, then a varying text
+    rng = random.Random(seed)
+    prefix = "Please continue the following text in the same style: " + " ".join(
+        rng.choice(WORDS) for _ in range(prefix_words))
+    return [prefix + " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))) for _ in range(count)]
+
+
+def run(family, path, prompt_file, work, count, batch, **options):
+    """Greedy outputs of one engine configuration: texts and completion token lists."""
+    model, tokenizer = load_model(family, path, torch.device("cpu"))
+    generation = LLMsGeneration(model, tokenizer, torch.device("cpu"), None, None, batch,
+                                max_length=MODEL_REGISTRY[family]["max_length"],
+                                position_ids=MODEL_REGISTRY[family]["position_ids"], **options)
+    # WordNet is not needed for the check: the budget counts Open words here
+    generation.budget_strategy = OpenVocab()
+    shard_dir = os.path.join(work, "shards")
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    shards = ShardedOutput(shard_dir)
+    generation.loadArray(prompt_file, batch, shards)
+    stored = shards.read(list(range(count)))
+    completions = [[int(token) for token in sequence[width:]] for sequence, width in stored]
+    return generation, generation.rawDoc, completions, stored
+
+
+def strip_pad(tokens, pad):
+    end = len(tokens)
+    while end and tokens[end - 1] == pad:
+        end -= 1
+    return tokens[:end]
+
+
+def check_family(family, args, work, tokenizer, prompt_file):
+    failures = []
+    pad = tokenizer.eos_token_id
+    path = build_model(family, work, tokenizer, args.size, args.layers)
+    reference = run(family, path, prompt_file, work, args.prompts, args.batch)[2]
+    if not args.no_eos:
+        counts = Counter(token for tokens in reference for token in tokens[len(tokens) // 2:] if token != pad)
+        path = build_model(family, work, tokenizer, args.size, args.layers, counts.most_common(1)[0][0])
+    run_args = (family, path, prompt_file, work, args.prompts)
+
+    _, texts, reference, stored = run(*run_args, args.batch)
+    longest = max(len(tokens) for tokens in reference)
+    ended = sum(pad in tokens for tokens in reference)
+
+    # batching and left padding do not change what is generated
+    single_texts, single, _ = run(*run_args, 1)[1:]
+    if single_texts != texts or [strip_pad(t, pad) for t in single] != [strip_pad(t, pad) for t in reference]:
+        failures.append("batch size 1 differs from batched generation")
+
+    # --prefix_cache gives the same outputs
+    prefix_texts, prefix, _ = run(*run_args, args.batch, prefix_cache=True)[1:]
+    if prefix_texts != texts or prefix != reference:
+        failures.append("--prefix_cache changes the greedy output")
+
+    # a budget no row reaches gives generate()'s output and layout
+    generation, budget_texts, budget, budget_stored = run(*run_args, args.batch, word_budget=10 ** 6)
+    if budget_texts != texts or budget != reference:
+        failures.append("_budget_sample differs from generate() when no row is retired")
+    if [s.shape for s, _ in budget_stored] != [s.shape for s, _ in stored]:
+        failures.append("_budget_sample output width differs from generate()")
+
+    # a small budget retires rows early: each row is a prefix of generate()'s
+    # output, padded with pad, and has more than the budget unless it ended
+    words = sorted(len(OpenVocab().process(text)) for text in
+                   tokenizer.batch_decode(reference, skip_special_tokens=True))
+    budget = args.budget or max(1, words[len(words) // 2] // 2)
+    _, _, short, _ = run(*run_args, args.batch, word_budget=budget)
+    retired = 0
+    for tokens, full in zip(short, reference):
+        kept = strip_pad(tokens, pad)
+        if tokens[len(kept):] != [pad] * (len(tokens) - len(kept)):
+            failures.append("retired rows are not padded with the pad token")
+        # the eos that ends a row is the pad token, so compare up to it
+        if kept != full[:len(kept)]:
+            failures.append("a retired row differs from generate()'s output")
+            break
+        if len(kept) < len(strip_pad(full, pad)):
+            retired += 1
+            words = len(OpenVocab().process(tokenizer.decode(kept, skip_special_tokens=True)))
+            if words <= budget:
+                failures.append(f"a row was retired with {words} <= {budget} words")
+    if retired == 0:
+        failures.append("no row was retired by the small budget")
+
+    # budget and prefix cache together
+    both = run(*run_args, args.batch, word_budget=budget, prefix_cache=True)[2]
+    if both != short:
+        failures.append("--word_budget with --prefix_cache differs from --word_budget alone")
+
+    print(f"{family}: {args.prompts} prompts, {ended} ended with eos, up to {longest} new tokens, "
+          f"{retired} retired early by a {budget}-word budget: "
+          f"{'ok' if not failures else '; '.join(failures)}")
+    return failures
+
+
+def prefill_speedup(family, args, work, tokenizer):
+    """Time of the prompt prefill (one new token) without and with --prefix_cache."""
+    path = build_model(family, work, tokenizer, args.timing_size, args.layers)
+    prompt_file = os.path.join(work, "timing.json")
+    with open(prompt_file, 'w') as file:
+        json.dump(make_prompts(args.timing_prompts, args.prefix_words), file)
+    new_tokens = engine.MAX_NEW_TOKENS
+    engine.MAX_NEW_TOKENS = 1
+    seconds = {}
+    for prefix_cache in (False, True):
+        best = None
+        for _ in range(args.repeats):
+            generation = run(family, path, prompt_file, work, args.timing_prompts, args.batch,
+                             prefix_cache=prefix_cache)[0]
+            best = generation.seconds if best is None else min(best, generation.seconds)
+        seconds[prefix_cache] = best
+    engine.MAX_NEW_TOKENS = new_tokens
+    print(f"{family}: prefill of {args.timing_prompts} prompts {seconds[False]:.3f}s, "
+          f"with --prefix_cache {seconds[True]:.3f}s ({seconds[False] / seconds[True]:.1f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Greedy CPU check of --prefix_cache and --word_budget on tiny models")
+    parser.add_argument('--families', nargs='+', default=sorted(MODEL_REGISTRY), choices=sorted(MODEL_REGISTRY))
+    parser.add_argument('--prompts', type=int, default=13, help="Prompts per check")
+    parser.add_argument('--batch', type=int, default=4, help="Batch size")
+    parser.add_argument('--new_tokens', type=int, default=40, help="MAX_NEW_TOKENS during the check")
+    parser.add_argument('--budget', type=int, default=None,
+                        help="Small word budget that retires rows early (default: half the median completion)")
+    parser.add_argument('--prefix_words', type=int, default=150, help="Words of the shared prompt prefix")
+    parser.add_argument('--size', type=int, default=32, help="Hidden size of the tiny models")
+    parser.add_argument('--layers', type=int, default=2, help="Layers of the tiny models")
+    parser.add_argument('--no_eos', action='store_true', help="Do not make the tiny models end rows with eos")
+    parser.add_argument('--timing_size', type=int, default=256, help="Hidden size of the model timed for prefill")
+    parser.add_argument('--timing_prompts', type=int, default=32, help="Prompts timed for prefill")
+    parser.add_argument('--repeats', type=int, default=3, help="Timing repeats (the fastest counts)")
+    args = parser.parse_args()
+
+    # greedy decoding, so every configuration must give the same tokens
+    engine.SAMPLING = {"do_sample": False}
+    engine.MAX_NEW_TOKENS = args.new_tokens
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // 2))
+
+    work = tempfile.mkdtemp()
+    try:
+        tokenizer = build_tokenizer(work)
+        prompt_file = os.path.join(work, "prompts.json")
+        with open(prompt_file, 'w') as file:
+                json.dump(make_prompts(args.prompts, args.prefix_words), file)
+        failures = []
+        for family in args.families:
+            failures += check_family(family, args, work, tokenizer, prompt_file)
+        for family in args.families:
+            prefill_speedup(family, args, work, tokenizer)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    sys.exit(1 if failures else 0)
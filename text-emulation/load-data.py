@@ -2,7 +2,7 @@ import json
 import os
 from tqdm import tqdm
 import pandas as pd
-from datasets import load_dataset
+from heapslaw.hfdata import iter_column
 
 
 class DataLoader:
@@ -14,16 +14,15 @@ class TypeOneLoader(DataLoader):
     def __init__(self, args):
         self.args = args
 
-    def load_data(self):
-        # Placeholder for actual import
-        my_dataset = load_dataset(self.args.inputdata)
-        df = pd.DataFrame(my_dataset['train'])
-        data = self.clean_data(df[self.args.choosedata], self.args.name)
-        return data
+    def load_data(self, limit=100000):
+        # Only the chosen column of the first `limit` rows is read, from the
+        # Arrow files of a saved or cached dataset, or as a stream
+        data = iter_column(self.args.inputdata, self.args.choosedata, limit)
+        return self.clean_data(data, self.args.name)
 
     def clean_data(self, data, name):
         # Assuming a simple cleanup function
-        cleaned_data = data.dropna()  # Example cleanup operation
+        cleaned_data = [item for item in data if item is not None]  # Example cleanup operation
         return cleaned_data
 
 
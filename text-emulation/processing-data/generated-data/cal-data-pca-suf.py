@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import glob
 import json
 import random
@@ -7,32 +8,29 @@ import pickle
 from tqdm import tqdm
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from heapslaw.corpus import read_corpus
+from heapslaw.growth import growth_points
+
 def process_json(file_path):
-    # Load JSON data
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    # Shuffle the data
-    random.shuffle(data)
+    # Load the JSON data (or memory-map a binary .corpus directory) and
+    # intern the words once, then shuffle the document order only
+    corpus = read_corpus(file_path)
+    order = list(range(corpus.n_docs))
+    random.shuffle(order)
     # Limit each sublist to a maximum of 225 words
-    capped_data = [sublist[:225] for sublist in data]
+    capped_data = corpus.capped(225)
     # Process the data to compute cumulative and unique word counts
-    processed_data = process(capped_data)
+    processed_data = process(capped_data, order)
     return processed_data
 
-def process(data):
-    newarray = []
-    overall_total_words = 0
-    overall_unique_words = set()
-    for word_array in data:
-        if word_array is not None:  # Ensure the entry is not None
-            overall_total_words += len(word_array)
-            overall_unique_words.update(word_array)
-            newarray.append([overall_total_words, len(overall_unique_words)])
-    return newarray
+def process(corpus, order=None):
+    # [N, V] after every document, computed from first-occurrence positions
+    return growth_points(corpus, order)
 
 def main():
     # Get all JSON files in the current directory
-    json_files = glob.glob('*.json')
+    json_files = glob.glob('*.json') + glob.glob('*.corpus')
     
     # Regular expression pattern for parsing filenames.
     # Expected filename format:
@@ -44,7 +42,7 @@ def main():
         r'(?P<model_size>[\d\.]+[bBmM])_'         # Model Size: e.g. 2.8b
         r'(?P<prompt>[^_]+)_'                     # Prompt Type: e.g. fewshot
         r')?'                                    # End optional group
-        r'(?P<vocab>[^\.]+)\.json$'              # Vocab Setting: e.g. open or close
+        r'(?P<vocab>[^\.]+)\.(?:json|corpus)$'   # Vocab Setting: e.g. open or close
     )
     
     # Define fixed seeds for reproducibility
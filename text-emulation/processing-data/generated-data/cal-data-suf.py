@@ -1,68 +1,62 @@
-import json
 import glob
+import argparse
 import os
+import sys
 import numpy as np
-from datetime import datetime
-from scipy.optimize import curve_fit
-from collections import Counter
-import random
 import csv
-import os
-import re
+from multiprocessing import Pool, cpu_count
 from tqdm import tqdm
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from heapslaw.cache import ResultCache
+from heapslaw.corpus import read_corpus
+from heapslaw.growth import growth_curve, shuffled_order
+from heapslaw.fitting import fit_power_law, fit_power_law_batch, summarize
+from heapslaw.naming import parse_file_name
+from heapslaw.permutation import DocumentIncidence, permutation_fits
+from heapslaw.rarefaction import rarefaction_curve, rarefaction_points
 
-def process_json(file_path):
-    with open(file_path, 'r') as file:
-        data = json.load(file)
-    random.shuffle(data)
-
-    all_words = []
-
-    # Limit each sublist to a maximum of 300 words
-    capped_data = [sublist[:225] for sublist in data]
+# Three shuffled versions per file; these seeds ensure the same shuffling each time
+FIXED_SEEDS = [42, 123, 999]
+# Maximum number of words kept from each document
+TOKEN_CAP = 225
 
-    # Flatten the list of lists after capping
-    all_words = [word for sublist in capped_data for word in sublist]
 
-    vocab = set(all_words)
-    total_words = len(all_words)
+def corpus_stats(capped_data, order):
+    total_words = int(capped_data.offsets[-1])
 
     # Calculate the length of each sublist (number of words in each list)
-    word_counts = [len(sublist) for sublist in capped_data]
+    word_counts = capped_data.lengths[order].tolist()
     mean_word_count = np.mean(word_counts)
     std_dev_word_count = np.std(word_counts)
 
     # Count occurrences of each word
-    word_frequencies = Counter(all_words)
+    word_frequencies = capped_data.frequencies()
+    vocab_size = int(np.count_nonzero(word_frequencies))
 
     # Identify singletons (words that appear exactly once)
-    singletons = [word for word, count in word_frequencies.items() if count == 1]
-    num_singletons = len(singletons)
-
-    # Prepare data for alpha-beta calculation
-    alpha, beta, r = alpha_beta(process(capped_data))
-
-    return mean_word_count, std_dev_word_count, len(vocab), total_words, word_counts, alpha, beta, num_singletons, r
-
+    num_singletons = int(np.count_nonzero(word_frequencies == 1))
 
-def process(data):
-    newarray = []
-    overall_total_words = 0
-    overall_unique_words = set()
+    return mean_word_count, std_dev_word_count, vocab_size, total_words, word_counts, num_singletons
 
-    for word_array in data:
-        if word_array is not None:  # Ensure the entry is not None
 
-            overall_total_words += len(word_array)
-            overall_unique_words.update(word_array)
-            newarray.append([overall_total_words, len(overall_unique_words)])
+def file_stats(file_path, seeds=FIXED_SEEDS):
+    """Statistics of one file for every shuffling seed, from a single parse."""
+    capped_data = read_corpus(file_path).capped(TOKEN_CAP)
 
-    return newarray
+    # same permutations as random.seed(seed); random.shuffle(data)
+    orders = [shuffled_order(capped_data.n_docs, seed) for seed in seeds]
+    # the curves of all seeds are fitted together
+    fits = fit_power_law_batch([growth_curve(capped_data, order) for order in orders])
 
-
-import numpy as np
-from scipy.optimize import curve_fit
+    stats = []
+    for order, (alpha, beta, r) in zip(orders, fits):
+        mean, std_dev, vocab_size, total_words, _, singleton_count = corpus_stats(capped_data, order)
+        stats.append({
+            "mean": float(mean), "s.d": float(std_dev), "vocab_size": vocab_size, "total_words": total_words,
+            "alpha": float(alpha), "beta": float(beta), "singleton_count": singleton_count, "r": float(r)
+        })
+    return stats
 
 
 def alpha_beta(data):
@@ -70,30 +64,17 @@ def alpha_beta(data):
     x = np.array([pair[0] for pair in data], dtype=float)
     y = np.array([pair[1] for pair in data], dtype=float)
 
-    # Define the power-law function
-    def power_law(x, alpha, beta):
-        return alpha * np.power(x, beta)
-
-    # Fit the power-law function to the data
-    params, _ = curve_fit(power_law, x, y, p0=[1, 1])
-    alpha, beta = params
-
-    # Compute fitted values
-    y_pred = power_law(x, alpha, beta)
-
-    # Compute R^2 value
-    ss_res = np.sum((y - y_pred) ** 2)  # Residual sum of squares
-    ss_tot = np.sum((y - np.mean(y)) ** 2)  # Total sum of squares
-    r_squared = 1 - (ss_res / ss_tot)
+    # Fit the power-law function alpha * x^beta (analytic Jacobian, log-log
+    # warm start) and compute its R^2 value
+    alpha, beta, r_squared = fit_power_law(x, y)
     return alpha, beta, r_squared
 
 
-def main():
-    # Pattern to match all JSON files in the current directory
-    json_files = glob.glob('*.json')
+def main(workers=None, cache_dir="../analysis/heap_law_cache"):
+    # Pattern to match all JSON files in the current directory (sorted so the
+    # rows always come out in the same order)
+    json_files = sorted(glob.glob('*.json') + glob.glob('*.corpus'))
     #        json_files = glob.glob('*_human_*.json')
-    # Store the results for each file
-    results = []
     # Define the CSV column headers
     csv_headers = [
         "file_name",  # Keeping file name for reference
@@ -112,65 +93,121 @@ def main():
         "r"
     ]
 
-    # Regular expression pattern for parsing filenames
-    filename_pattern = re.compile(
-        r'^(?P<corpus>[^_]+)_'  # Corpus: PubMed or hn
-        r'(?P<model_name>[^-_]+)'  # Model Name: human or pythia
-        r'(?:-'  # Start optional group for non-human models
-        r'(?P<model_size>[\d\.]+[bBmM])_'  # Model Size: 2.8b
-        r'(?P<prompt>[^_]+)_'  # Prompt Type: fewshot
-        r')?'  # End optional group
-        r'(?P<vocab>[^\.]+)\.json$'  # Vocab Setting: Open or Close
-    )
-
     output_file = f"../analysis/heap_law_data.csv"
 
-    # Define fixed seeds for reproducibility
-    fixed_seeds = [42, 123, 999]  # These seeds ensure the same shuffling each time
-
-    # Open the CSV file in append mode (outside the loop)
-    with open(output_file, 'a', newline='') as f:
+    # Results are cached per (file content, token cap, seed, code version)
+    cache = ResultCache(cache_dir)
+    keys = {file_path: [cache.key(cache.digest(file_path), TOKEN_CAP, seed) for seed in FIXED_SEEDS]
+            for file_path in json_files}
+    cache.save_index()
+    missing = [file_path for file_path in json_files if any(cache.get(key) is None for key in keys[file_path])]
+
+    # Only new or changed files are computed: every one is parsed once by one
+    # worker, which produces the statistics of all three seeds
+    if missing:
+        with Pool(workers or cpu_count()) as pool:
+            for file_path, stats in zip(missing, tqdm(pool.imap(file_stats, missing), total=len(missing))):
+                for key, value in zip(keys[file_path], stats):
+                    cache.put(key, value)
+
+    # The CSV is regenerated from the cache, so re-running never duplicates rows
+    with open(output_file, 'w', newline='') as f:
         writer = csv.writer(f)
+        writer.writerow(csv_headers)
 
-        # Write the header only if the file is empty
-        if os.stat(output_file).st_size == 0:
-            writer.writerow(csv_headers)
-
-        for file_path in tqdm(json_files):
+        for file_path in json_files:
             file_name = os.path.basename(file_path)
+            parts = parse_file_name(file_name)
+            for key in keys[file_path]:
+                stats = cache.get(key)
+                writer.writerow([
+                    file_name.lower(), parts["corpus"], parts["model_name"], parts["model_size"], parts["prompt"],
+                    parts["vocab"], stats["mean"], stats["s.d"], stats["vocab_size"], stats["total_words"],
+                    stats["alpha"], stats["beta"], stats["singleton_count"], stats["r"]
+                ])
 
-            for i in range(3):  # Three different shuffled versions per file
-                seed = fixed_seeds[i]  # Use a pre-defined seed for reproducibility
-                random.seed(seed)  # Set the seed before shuffling
 
-                # Extract components from the filename
-                match = filename_pattern.match(file_name)
-                if match:
-                    corpus = match.group("corpus").lower()
-                    model_name = match.group("model_name").lower()
-                    model_size = match.group("model_size").lower() if match.group("model_size") else None
-                    prompt = match.group("prompt").lower() if match.group("prompt") else None
-                    vocab = match.group("vocab").lower()
-                else:
-                    corpus, model_name, model_size, prompt, vocab = None, None, None, None, None
+def permutation_bands(json_files, n_permutations, seed=42, output_file="../analysis/heap_law_permutation_bands.csv"):
+    """Order variance of the fit from many document permutations at once.
 
-                # Process the JSON and calculate statistics with the shuffled data
-                mean, std_dev, vocab_size, total_words, word_counts, alpha, beta, singleton_count, r = process_json(
-                    file_path)
+    alpha_expected/beta_expected fit the exact expected curve over all
+    orders, the other columns summarise the fits of `n_permutations` random
+    orders (mean, s.d. and 95% interval).
+    """
+    csv_headers = ["file_name", "corpus", "model_name", "model_size", "prompt", "vocab",
+                   "n_permutations", "alpha_expected", "beta_expected", "r_expected"]
+    for name in ("alpha", "beta", "r"):
+        csv_headers += [f"{name}_mean", f"{name}_sd", f"{name}_lo", f"{name}_hi"]
 
-                # Debugging print statement to confirm iteration and seed used
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_headers)
 
-                # Append results including the seed used
-                results.append((file_name.lower(), corpus, model_name, model_size, prompt, vocab,
-                                mean, std_dev, vocab_size, total_words, alpha, beta, singleton_count, r))
+        for file_path in tqdm(json_files):
+            file_name = os.path.basename(file_path)
+            parts = parse_file_name(file_name)
+
+            # The document order does not matter here: the incidence of
+            # types in documents is all the permutations need
+            incidence = DocumentIncidence(read_corpus(file_path).capped(TOKEN_CAP))
+            EN, EV = incidence.expected_curve()
+            alpha_e, beta_e, r_e = fit_power_law(EN, EV)
+            fits = permutation_fits(incidence, n_permutations, seed)
+
+            row = [file_name.lower(), parts["corpus"], parts["model_name"], parts["model_size"],
+                   parts["prompt"], parts["vocab"], n_permutations, alpha_e, beta_e, r_e]
+            for column in range(3):
+                band = summarize(fits[:, column])
+                row += [band["mean"], band["sd"], band["lo"], band["hi"]]
+            writer.writerow(row)
+
+
+def rarefaction_stats(json_files, match_size=None, output_file="../analysis/heap_law_rarefaction.csv"):
+    """Heaps' law fit of the exact expected (rarefied) vocabulary curve.
+
+    The curve only depends on the frequency spectrum, so there is a single
+    order-independent row per file.  vocab_at_match is E[V(n)] at a common
+    sample size (the smallest total_words by default), which makes corpora
+    of different sizes directly comparable.
+    """
+    spectra = {}
+    for file_path in json_files:
+        capped_data = read_corpus(file_path).capped(TOKEN_CAP)
+        spectra[file_path] = (capped_data.frequencies(), capped_data.n_docs)
+    if match_size is None:
+        match_size = min(int(freqs.sum()) for freqs, _ in spectra.values())
+
+    csv_headers = ["file_name", "corpus", "model_name", "model_size", "prompt", "vocab",
+                   "vocab_size", "total_words", "alpha", "beta", "r", "match_size", "vocab_at_match"]
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(csv_headers)
 
-                # Write the result to the CSV file (convert all string values to lowercase, keep missing as None)
-                writer.writerow([
-                    file_name.lower(), corpus, model_name, model_size, prompt, vocab,
-                    mean, std_dev, vocab_size, total_words,
-                    alpha, beta, singleton_count, r
-                ])
+        for file_path, (freqs, n_docs) in tqdm(spectra.items()):
+            file_name = os.path.basename(file_path)
+            parts = parse_file_name(file_name)
+            # one point per document on average, like the shuffled curve
+            alpha, beta, r = alpha_beta(rarefaction_points(freqs, n_docs))
+            writer.writerow([file_name.lower(), parts["corpus"], parts["model_name"], parts["model_size"],
+                             parts["prompt"], parts["vocab"], int(np.count_nonzero(freqs)), int(freqs.sum()),
+                             alpha, beta, r, match_size, float(rarefaction_curve(freqs, match_size)[0])])
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--permutations', type=int, default=0,
+                        help='if > 0, write alpha/beta bands over this many document orders instead')
+    parser.add_argument('--rarefaction', action='store_true',
+                        help='fit the exact expected vocabulary curve instead of shuffled curves')
+    parser.add_argument('--match_size', type=int, default=None,
+                        help='sample size for the size-matched vocabulary (default: smallest corpus)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    if args.permutations > 0:
+        permutation_bands(glob.glob('*.json') + glob.glob('*.corpus'), args.permutations)
+    elif args.rarefaction:
+        rarefaction_stats(glob.glob('*.json') + glob.glob('*.corpus'), args.match_size)
+    else:
+        main(args.workers)
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import argparse
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from heapslaw.sampling import read_documents, sample_spans
+
+# Number of documents selected from each corpus
+SAMPLE_SIZE = 240000
+# Fixed seed so the same documents are selected each time
+SEED = 42
+# Key of the text in documents that are JSON objects
+TEXT_FIELD = "text"
+
+CORPORA = [
+    'AllData/HackerNews.json',
+    'AllData/PUBMED_title_abstracts_2019_baseline.jsonl',
+    'AllData/wiki.json',
+]
+
+
+def choose_data(input_path, output_path, k=SAMPLE_SIZE, seed=SEED, field=TEXT_FIELD):
+    # One pass over the corpus keeps the byte spans of a uniform sample;
+    # only the chosen documents are parsed afterwards
+    spans, total = sample_spans(input_path, k, seed)
+    print(f"{input_path}: selected {len(spans)} of {total} documents")
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for i, document in enumerate(tqdm(read_documents(input_path, spans), total=len(spans))):
+            # create-prompt.py expects strings; PubMed lines are {"text", "meta"}
+            if isinstance(document, dict):
+                document = document[field]
+            file.write(', ' if i else '')
+            file.write(json.dumps(document))
+        file.write(']')
+    print(f"Data saved to {output_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inputs', type=str, nargs='+', default=CORPORA, help='.json/.jsonl corpora to sample from')
+    parser.add_argument('--output_dir', type=str, default='all-data', help='Directory for the selected documents')
+    parser.add_argument('--size', type=int, default=SAMPLE_SIZE, help='Documents selected per corpus')
+    parser.add_argument('--seed', type=int, default=SEED, help='Seed of the reservoir sampler')
+    parser.add_argument('--field', type=str, default=TEXT_FIELD, help='Key of the text when documents are JSON objects')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for input_path in args.inputs:
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        choose_data(input_path, os.path.join(args.output_dir, f"{name}.json"), args.size, args.seed, args.field)
@@ -1,4 +1,20 @@
+import os
+import sys
 import json
+import argparse
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from heapslaw.jsonstream import iter_documents
+from heapslaw.lengths import LengthStats
+
+CORPORA = [
+    'AllData/HackerNews.json',
+    'AllData/PUBMED_title_abstracts_2019_baseline.jsonl',
+    'AllData/wiki.json',
+]
+# Document lengths handed to the statistics at a time
+BATCH_SIZE = 4096
 
 
 def load_json_or_jsonl(file_path):
@@ -34,19 +50,59 @@ def bookInfor(data):
     return allpara
 
 
-data_json = load_json_or_jsonl('AllData/HackerNews.json')
-print(f"have average: {averge(data_json)}")
-print(f"have document: {document_count(data_json)}")
+def iter_texts(file_path):
+    """Stream the documents of a .json (list or object) or .jsonl corpus as text."""
+    if file_path.endswith('.jsonl'):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            documents = (json.loads(line) for line in file if line.strip())
+            yield from map(document_text, documents)
+    elif file_path.endswith('.json'):
+        yield from map(document_text, iter_documents(file_path, allow_object=True))
+    else:
+        raise ValueError("Unsupported file type. Please provide a '.json' or '.jsonl' file.")
+
+
+def document_text(document):
+    # data-combination.py writes plain strings, lists of lines (books) or
+    # {"source", "id", "text"} records (JSON lines)
+    if isinstance(document, dict):
+        return document["text"]
+    if isinstance(document, list):
+        return "".join(document)
+    return document
+
+
+def corpus_stats(file_path):
+    # Same length as averge(): the number of pieces between single spaces
+    stats = LengthStats()
+    lengths = []
+    for text in iter_texts(file_path):
+        lengths.append(text.count(" ") + 1)
+        if len(lengths) == BATCH_SIZE:
+            stats.update(lengths)
+            lengths = []
+    stats.update(lengths)
+    return file_path, stats.summary()
+
 
-data_json = load_json_or_jsonl('AllData/PUBMED_title_abstracts_2019_baseline.jsonl')
-print(f"have average: {averge(data_json)}")
-print(f"have document: {document_count(data_json)}")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpora', type=str, nargs='+', default=CORPORA, help='.json/.jsonl corpora to describe')
+    parser.add_argument('--summary', type=str, default='corpus-stats.json', help='JSON file for the statistics')
+    parser.add_argument('--workers', type=int, default=None, help='Corpora read at the same time (default: all)')
+    args = parser.parse_args()
 
-data_json = load_json_or_jsonl('AllData/wiki.json')
-print(f"have average: {averge(data_json)}")
-print(f"have document: {document_count(data_json)}")
+    # One streaming pass per corpus, all corpora at the same time
+    summaries = {}
+    with Pool(args.workers or len(args.corpora)) as pool:
+        for file_path, summary in pool.imap(corpus_stats, args.corpora):
+            summaries[file_path] = summary
+            quantiles = ", ".join(f"{q}: {value}" for q, value in summary["quantiles"].items())
+            print(file_path)
+            print(f"have average: {summary['mean']} (variance {summary['variance']}, total word: {summary['tokens']})")
+            print(f"have document: {summary['documents']}")
+            print(f"quantiles: {quantiles}")
 
-data_json = load_json_or_jsonl('AllData/wiki.json')
-data_json = bookInfor(data_json)
-print(f"have average: {averge(data_json)}")
-print(f"have document: {document_count(data_json)}")
+    with open(args.summary, 'w') as file:
+        json.dump(summaries, file, indent=4)
+    print(f"Statistics saved to {args.summary}")
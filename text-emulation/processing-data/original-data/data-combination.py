@@ -1,15 +1,21 @@
 import re
 import os
 import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tqdm import tqdm
 
+# Where the combined corpora are written (data-analysis.py reads them from here)
+OUTPUT_DIR = 'AllData'
+
 
 def sanitize_filename(filename: str) -> str:
     """Sanitize the filename by removing invalid characters."""
     return re.sub(r'[<>:"/\\|?*]', '_', filename)
 
 
-def process_books_to_dict_and_save(folder_path: str, output_filename: str = 'processedBook3.json'):
+def process_books_to_dict_and_save(folder_path: str, output_filename: str = 'processedBook3.json', output_dir: str = OUTPUT_DIR):
     # Dictionary to hold the processed data
     books_dict = {}
 
@@ -26,7 +32,7 @@ def process_books_to_dict_and_save(folder_path: str, output_filename: str = 'pro
         books_dict[base_filename] = content
 
     # Define the path where the dictionary will be saved
-    output_path = os.path.join(folder_path, output_filename)
+    output_path = os.path.join(output_dir, output_filename)
 
     # Save the dictionary as a JSON file
     with open(output_path, 'w', encoding='utf-8') as json_file:
@@ -35,11 +41,7 @@ def process_books_to_dict_and_save(folder_path: str, output_filename: str = 'pro
     print(f"Processed data saved to {output_path}")
 
 
-# Example usage:
-process_books_to_dict_and_save('AllData/books1/epubtxt')
-
-
-def combine_json_files(folder_path: str, output_filename: str = 'wikipedia_output.json'):
+def combine_json_files(folder_path: str, output_filename: str = 'wikipedia_output.json', output_dir: str = OUTPUT_DIR):
     combined_data = []
 
     # Get list of all .json files in the folder
@@ -56,7 +58,7 @@ def combine_json_files(folder_path: str, output_filename: str = 'wikipedia_outpu
                 print(f"Warning: {json_file} does not contain a list and will be skipped.")
 
     # Define the path where the combined data will be saved
-    output_path = os.path.join("D:\Heaps-Law-In-LLMs-Paper\data\originalData", output_filename)
+    output_path = os.path.join(output_dir, output_filename)
 
     # Save the combined list as a JSON file
     with open(output_path, 'w', encoding='utf-8') as outfile:
@@ -65,10 +67,6 @@ def combine_json_files(folder_path: str, output_filename: str = 'wikipedia_outpu
     print(f"Combined data saved to {output_path}")
 
 
-# Example usage:
-combine_json_files('AllData/wikipedia_output-20240729T150327Z-001')
-
-
 def is_text_file(file_path):
     """Attempt to open the file and decode it as UTF-8 text."""
     try:
@@ -83,7 +81,7 @@ def is_text_file(file_path):
         return None
 
 
-def combine_files_to_string_and_save(folder_path: str, output_filename: str = 'HackerNews.json'):
+def combine_files_to_string_and_save(folder_path: str, output_filename: str = 'HackerNews.json', output_dir: str = OUTPUT_DIR):
     combined_text = []
 
     # Get list of all files in the folder
@@ -97,7 +95,7 @@ def combine_files_to_string_and_save(folder_path: str, output_filename: str = 'H
             combined_text.append(text_data)  # Add newline to separate contents of different files
 
     # Define the path where the combined string will be saved
-    output_path = os.path.join(r"E:\Heaps-Law-In-LLMs-Paper\data\originalData\AllData", output_filename)
+    output_path = os.path.join(output_dir, output_filename)
 
     # Save the combined string as a JSON file
     with open(output_path, 'w', encoding='utf-8') as outfile:
@@ -106,5 +104,100 @@ def combine_files_to_string_and_save(folder_path: str, output_filename: str = 'H
     print(f"Combined text saved to {output_path}")
 
 
-# Example usage:
-combine_files_to_string_and_save(r'E:\Heaps-Law-In-LLMs-Paper\data\originalData\data')
+
+# Parallel ingest: every source file is read and decoded on a pool and its
+# documents are written as JSON lines {"source", "id", "text"} as soon as they
+# arrive, so memory stays at a few files instead of the whole corpus.
+
+def _book_records(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        text = file.read()
+    base_filename = sanitize_filename(os.path.splitext(os.path.basename(file_path))[0])
+    return [{"source": "books", "id": base_filename, "text": text}]
+
+
+def _wikipedia_records(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if not isinstance(data, list):
+        print(f"Warning: {os.path.basename(file_path)} does not contain a list and will be skipped.")
+        return []
+    name = os.path.basename(file_path)
+    return [{"source": "wikipedia", "id": f"{name}:{i}", "text": article} for i, article in enumerate(data)]
+
+
+def _hackernews_records(file_path):
+    text_data = is_text_file(file_path)
+    if not text_data:
+        return []
+    return [{"source": "hackernews", "id": os.path.basename(file_path), "text": text_data}]
+
+
+# source -> (reader, which files of the folder it reads, output file)
+SOURCES = {
+    "books": (_book_records, lambda name: name.endswith('.txt'), 'processedBook3.jsonl'),
+    "wikipedia": (_wikipedia_records, lambda name: name.endswith('.json'), 'wikipedia_output.jsonl'),
+    "hackernews": (_hackernews_records, lambda name: True, 'HackerNews.jsonl'),
+}
+
+
+def ingest_to_jsonl(source: str, folder_path: str, output_dir: str = OUTPUT_DIR, workers: int = None,
+                    processes: bool = False):
+    """Read the files of `folder_path` on a thread (or process) pool and write their documents as JSON lines.
+
+    Documents are written in file-name order; at most four files per worker
+    are read ahead of the writer.
+    """
+    reader, wanted, output_filename = SOURCES[source]
+    files = sorted(f for f in os.listdir(folder_path) if wanted(f))
+    workers = workers or os.cpu_count() or 1
+    output_path = os.path.join(output_dir, output_filename)
+    os.makedirs(output_dir, exist_ok=True)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if processes else ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    documents = 0
+    with pool, open(output_path, 'w', encoding='utf-8') as outfile:
+        def write_next():
+            nonlocal documents
+            for record in pending.popleft().result():
+                outfile.write(json.dumps(record, ensure_ascii=False) + '\n')
+                documents += 1
+
+        for file_name in tqdm(files, desc=f"Ingesting {source}"):
+            pending.append(pool.submit(reader, os.path.join(folder_path, file_name)))
+            if len(pending) >= 4 * workers:
+                write_next()
+        while pending:
+            write_next()
+
+    print(f"{documents} documents from {len(files)} files saved to {output_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--books', type=str, default='AllData/books1/epubtxt', help='Folder of the book .txt files')
+    parser.add_argument('--wikipedia', type=str, default='AllData/wikipedia_output-20240729T150327Z-001',
+                        help='Folder of the Wikipedia .json files')
+    parser.add_argument('--hackernews', type=str, default='data', help='Folder of the Hacker News text files')
+    parser.add_argument('--sources', type=str, nargs='+', default=list(SOURCES), choices=list(SOURCES),
+                        help='Corpora to combine')
+    parser.add_argument('--output_dir', type=str, default=OUTPUT_DIR, help='Directory for the combined corpora')
+    parser.add_argument('--format', type=str, default='json', choices=['json', 'jsonl'],
+                        help='One indented JSON file per corpus, or JSON lines written by a parallel ingest')
+    parser.add_argument('--workers', type=int, default=None, help='Pool size of the JSON lines ingest (default: all cores)')
+    parser.add_argument('--processes', action='store_true',
+                        help='Use processes instead of threads (when decoding, not reading, is the bottleneck)')
+    args = parser.parse_args()
+
+    folders = {"books": args.books, "wikipedia": args.wikipedia, "hackernews": args.hackernews}
+    os.makedirs(args.output_dir, exist_ok=True)
+    for source in args.sources:
+        if args.format == 'jsonl':
+            ingest_to_jsonl(source, folders[source], args.output_dir, args.workers, args.processes)
+        elif source == "books":
+            process_books_to_dict_and_save(folders[source], output_dir=args.output_dir)
+        elif source == "wikipedia":
+            combine_json_files(folders[source], output_dir=args.output_dir)
+        else:
+            combine_files_to_string_and_save(folders[source], output_dir=args.output_dir)
@@ -0,0 +1,84 @@
+import os
+import sys
+import random
+
+import contractions
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from heapslaw.cleaning import OpenVocab, SimpleProcessing, WordCounter
+from heapslaw.normalize import TextNormalizer
+
+# Every key contractions.fix can rewrite (iterating the TextSearch is what
+# `_anchor_words` relies on as well)
+KEYS = sorted(contractions.replacers[(True, True)])
+ACCENTED = [
+    "Café naïve fiancée résumé", "Œuvre æther ﬁnal ﬂour ﬀ", "ǅemal Straße ß", "“quoted” ‘it’s’ don’t",
+    "Ångström São Paulo Zürich", "½ ² ™ ℃ №", "ｆｕｌｌｗｉｄｔｈ", "naïve’s café’d", "日本語 text",
+]
+WHITESPACE = [" ", "  ", "\t", "\n", "\r\n", " ", " ", "　", "\x0b", "\x0c", " \t "]
+WORDS = ["the", "cause", "r", "to", "I", "It's", "y'all", "can't", "u", "ur", "well", "done", "_under_", "a.b",
+         "end.", "(yes)", "Don't", "CAN'T", "'tis", "o'clock", "e.g.", "U.S.", "x--y", "rock'n'roll"]
+STRATEGIES = [OpenVocab(), SimpleProcessing()]
+
+
+class WithoutExpansions(OpenVocab):
+    # Drops two words that only multi-word contractions produce, so a count
+    # that splits such a contraction is wrong (a stand-in for CloseVocab)
+    def process(self, data: str):
+        return [word for word in super().process(data) if word not in ("because", "are")]
+
+
+def mismatches(texts):
+    return [(type(strategy).__name__, text) for strategy in STRATEGIES for text in texts
+            if strategy.process(text) != strategy.reference_process(text)]
+
+
+def test_anchor_words_cover_multi_word_keys():
+    anchors = TextNormalizer().anchors
+    assert any(" " in key.strip() for key in KEYS)
+    assert {"cause", "r"} <= anchors
+
+
+def test_every_contraction_key():
+    texts = []
+    for key in KEYS:
+        texts += [key, f"I said {key} yesterday", f"{key.upper()}!", f"{key.title()}, then {key}.",
+                  f"({key})", f"x{key}", f"{key}{key}"]
+    assert mismatches(texts) == []
+
+
+def test_accented_and_ligature_input():
+    texts = ACCENTED + [f"{text} {key}" for text in ACCENTED for key in ("can't", "to cause", "r u", "ya'll")]
+    assert mismatches(texts) == []
+
+
+def test_whitespace_variants():
+    texts = [space.join(["I", "can't", "go", "to", "cause", "r", "u"]) for space in WHITESPACE]
+    texts += [f"{space}{key}{space}" for space in WHITESPACE for key in ("to cause", "r ", "don't")]
+    texts += [f"to{space}cause" for space in WHITESPACE] + [f"r{space}u" for space in WHITESPACE]
+    assert mismatches(texts) == []
+
+
+def test_word_counter_matches_whole_text():
+    rng = random.Random(1)
+    pieces = KEYS + ACCENTED + WORDS + ["to", "cause", "r", "u", "R"] * 20
+    strategy = WithoutExpansions()
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) + rng.choice(WHITESPACE + [",", ". ", "-", ""])
+                       for _ in range(rng.randint(0, 60)))
+        counter = WordCounter(strategy)
+        end = 0
+        while end < len(text):
+            step = rng.randint(1, 12)
+            counter.add(text[end:end + step])
+            end += step
+            assert counter.count() == len(strategy.process(text[:end])), text[:end]
+
+
+def test_random_documents():
+    # The per-token cache is shared across documents, as in a cleaning worker
+    rng = random.Random(0)
+    pieces = KEYS + ACCENTED + WORDS
+    texts = ["".join(rng.choice(pieces) + rng.choice(WHITESPACE + [",", ". ", "-", ""])
+                     for _ in range(rng.randint(0, 40))) for _ in range(3000)]
+    assert mismatches(texts) == []